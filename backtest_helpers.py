@@ -0,0 +1,220 @@
+"""
+Backtest the forecast on the user's own history, to see which trend
+strength would have forecast it best.
+
+We fit the model to the data up to a few cutoffs (rolling origin
+cross validation), forecast the rows after each cutoff once, then
+apply every trend multiplier to those forecasts (see
+forecast_core.trend_lookup) and compare them with what actually
+happened. The cutoffs are fitted in parallel and both the models
+and the forecasts are cached.
+
+Nothing here uses Streamlit.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import forecast_core as fc
+import job_helpers as jh
+
+
+# The same steps as the trend slider in the app (0% to 100% in 5% steps)
+MULTIPLIERS = [round(m, 2) for m in np.linspace(0, 1, 21)]
+
+DEFAULT_CUTOFFS = 3
+
+
+def choose_cutoffs(
+        rows: int,
+        horizon: int,
+        n_cutoffs: int = DEFAULT_CUTOFFS,
+        ) -> list[int]:
+    """
+    How many rows to train on for each backtest, oldest first.
+
+    The last cutoff leaves horizon rows to forecast, and each earlier
+    one is half a horizon before it (like Prophet's cross_validation).
+    Every cutoff trains on at least three horizons of data.
+    """
+
+    if horizon < 1:
+        raise ValueError("We need to forecast at least one row to backtest")
+
+    step = max(1, horizon // 2)
+    last_cutoff = rows - horizon
+    cutoffs = [last_cutoff - i * step for i in range(n_cutoffs)]
+    cutoffs = [c for c in cutoffs if c >= 3 * horizon]
+
+    if not cutoffs:
+        raise ValueError(f"""
+There isn't enough history to backtest a forecast of {horizon} rows,
+we need at least {4 * horizon} rows but there are {rows}.""")
+
+    return sorted(cutoffs)
+
+
+def forecast_cutoff(
+        df: pd.DataFrame,
+        config: fc.ModelConfig,
+        cutoff: int,
+        horizon: int,
+        use_cache: bool = fc.MODEL_CACHE,
+        ) -> pd.DataFrame:
+    """
+    Fit to the first cutoff rows of the history and forecast the
+    next horizon rows, returned alongside what actually happened (y).
+    """
+
+    m = fc.fit_model(
+        df = df.iloc[:cutoff],
+        config = config,
+        use_cache = use_cache)
+
+    actual = df.iloc[cutoff:cutoff + horizon]
+
+    # Intervals don't change yhat, so there's no need to simulate them
+    forecast = fc.predict(
+        fitted_model = m,
+        future_data = actual.drop(columns = ["y"]),
+        interval_mode = "none",
+        use_cache = use_cache)
+
+    forecast["y"] = actual["y"].to_numpy()
+    forecast["cutoff"] = df["ds"].iloc[cutoff - 1]
+
+    return forecast
+
+
+def run_backtest(
+        df: pd.DataFrame,
+        config: fc.ModelConfig,
+        horizon: int,
+        n_cutoffs: int = DEFAULT_CUTOFFS,
+        workers: Optional[int] = None,
+        use_cache: bool = fc.MODEL_CACHE,
+        ) -> list[pd.DataFrame]:
+    """
+    Forecast from each cutoff (see choose_cutoffs), fitting the
+    cutoffs in parallel. Returns one forecast per cutoff, oldest first.
+    """
+
+    cutoffs = choose_cutoffs(rows = len(df), horizon = horizon, n_cutoffs = n_cutoffs)
+
+    if workers is None:
+        workers = jh.available_cores()
+    workers = max(1, min(workers, len(cutoffs)))
+
+    if workers == 1:
+        return [
+            forecast_cutoff(df, config, cutoff, horizon, use_cache)
+            for cutoff in cutoffs
+            ]
+
+    # Spawn for the same reason as the fitting jobs (see job_helpers)
+    with ProcessPoolExecutor(
+            max_workers = workers,
+            mp_context = multiprocessing.get_context("spawn"),
+            initializer = jh.quiet_logging) as pool:
+        futures = [
+            pool.submit(forecast_cutoff, df, config, cutoff, horizon, use_cache)
+            for cutoff in cutoffs
+            ]
+
+        forecasts = []
+        for cutoff, future in zip(cutoffs, futures):
+            try:
+                forecasts.append(future.result())
+            except ValueError:
+                raise
+            except Exception as e:
+                # i.e. the worker died (BrokenProcessPool) from running out of memory
+                raise ValueError(f"""
+The backtest stopped unexpectedly while fitting the model to the first {cutoff} rows
+({type(e).__name__}, it may have run out of memory), please try again.""") from e
+
+        return forecasts
+
+
+def score_multipliers(
+        cutoff_forecasts: list[pd.DataFrame],
+        use_log_scale: bool,
+        multipliers: list[float] = MULTIPLIERS,
+        ) -> pd.DataFrame:
+    """
+    The error of every cutoff's forecast with each trend multiplier
+    applied, one row per multiplier.
+
+    mae is the mean absolute error and mape the mean absolute
+    percentage error (leaving out rows where the actual value is 0).
+    """
+
+    actual = np.concatenate([f["y"].to_numpy(dtype=float) for f in cutoff_forecasts])
+    non_zero = actual != 0
+
+    # Every multiplier for every cutoff at once (each cutoff's trend is 
+    # fixed from its own first forecast row), the bounds don't matter here
+    predicted = np.concatenate(
+        [
+            fc.trend_lookup(
+                forecast_df = forecast,
+                scale_bounds = False,
+                use_log_scale = use_log_scale,
+                ).all_adjusted(multipliers)[:, 0]
+            for forecast in cutoff_forecasts
+        ],
+        axis = 1)
+
+    errors = np.abs(predicted - actual)
+
+    scores = []
+    for i, multiplier in enumerate(multipliers):
+        scores.append({
+            "multiplier": multiplier,
+            "trend_percent": int(round(multiplier * 100)),
+            "mae": errors[i].mean(),
+            "mape": (errors[i, non_zero] / np.abs(actual[non_zero])).mean() * 100 if non_zero.any() else np.nan,
+        })
+
+    return pd.DataFrame(scores)
+
+
+def backtest_multipliers(
+        df: pd.DataFrame,
+        config: fc.ModelConfig,
+        horizon: int,
+        n_cutoffs: int = DEFAULT_CUTOFFS,
+        workers: Optional[int] = None,
+        use_cache: bool = fc.MODEL_CACHE,
+        multipliers: list[float] = MULTIPLIERS,
+        ) -> pd.DataFrame:
+    """
+    Backtest the model on the history and score every trend
+    multiplier, with one fit and one forecast per cutoff.
+    """
+
+    cutoff_forecasts = run_backtest(
+        df = df,
+        config = config,
+        horizon = horizon,
+        n_cutoffs = n_cutoffs,
+        workers = workers,
+        use_cache = use_cache)
+
+    return score_multipliers(
+        cutoff_forecasts = cutoff_forecasts,
+        use_log_scale = config.use_log_scale,
+        multipliers = multipliers)
+
+
+def best_multiplier(
+        scores: pd.DataFrame,
+        metric: str = "mae",
+        ) -> float:
+    # The multiplier with the lowest error (the strongest trend if tied)
+    best = scores.sort_values([metric, "multiplier"], ascending = [True, False])
+    return float(best["multiplier"].iloc[0])
@@ -0,0 +1,301 @@
+"""
+Forecast (and adjust the trend of) a whole directory of CSVs from
+the command line, running the files in parallel.
+
+Run from the root of the repo, i.e.
+
+    python batch_forecast.py "client_data/*.csv" --date-col Date --target-col sessions --multiplier 0.5
+
+Each file gets the same checks and forecast as it would in the app,
+and the output (the same as the app's download) is written to
+--output-dir as <file name>_forecast.csv (so the batch won't start
+if two files have the same name). A file with a problem is reported
+and skipped without stopping the others.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional
+
+import check_helpers as chk
+import forecast_core as fc
+import job_helpers as jh
+
+
+@dataclass
+class BatchSettings:
+    data_config: fc.DataConfig
+    holiday_countries: list[str]
+    use_log_scale: bool
+    multiplier: float
+    scale_bounds: bool
+    output_dir: str
+    use_cache: bool
+    interval_mode: str = "full"
+    # Used instead of multiplier if set
+    trend_schedule: Optional[fc.TrendSchedule] = None
+
+
+@dataclass
+class FileResult:
+    path: str
+    rows: int = 0
+    seconds: float = 0.0
+    output_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def find_files(inputs: list[str]) -> list[str]:
+    """
+    Expand directories and glob patterns into a sorted list of csvs.
+    """
+
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.csv")
+        paths.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+
+    return sorted(paths)
+
+
+def output_name(path: str) -> str:
+    # The file name each csv's forecast is written to
+    return f"{os.path.splitext(os.path.basename(path))[0]}_forecast.csv"
+
+
+def output_clashes(paths: list[str]) -> dict[str, list[str]]:
+    """
+    Files which would write their forecasts to the same output file
+    (i.e. a/sales.csv and b/sales.csv), by the name they share.
+    """
+
+    by_name: dict[str, list[str]] = {}
+    for path in paths:
+        by_name.setdefault(output_name(path), []).append(path)
+
+    return {name: clashing for name, clashing in by_name.items() if len(clashing) > 1}
+
+
+def forecast_file(
+        path: str,
+        settings: BatchSettings,
+        ) -> FileResult:
+    """
+    Check, forecast and adjust one csv, returning the error
+    (rather than raising it) if anything goes wrong.
+    """
+
+    start = time.perf_counter()
+    result = FileResult(path = path)
+    config = settings.data_config
+
+    try:
+        data = chk.read_csv_in_chunks(
+            file = path,
+            date_col = config.date_col,
+            numeric_cols = [config.target_col] + config.regressor_cols,
+        )
+        result.rows = len(data)
+
+        checked = fc.check_data(df = data, config = config)
+
+        model_config = fc.ModelConfig(
+            regressor_cols = config.regressor_cols,
+            holiday_countries = settings.holiday_countries,
+            use_log_scale = settings.use_log_scale,
+            data_frequency = checked.data_frequency,
+        )
+
+        forecast = fc.forecast(
+            checked = checked,
+            config = model_config,
+            use_cache = settings.use_cache,
+            interval_mode = settings.interval_mode)
+
+        multiplier = settings.multiplier
+        if settings.trend_schedule is not None:
+            multiplier = settings.trend_schedule.multipliers(forecast["ds"])
+
+        adjusted = fc.adjust_forecast(
+            forecast_df = forecast,
+            multiplier = multiplier,
+            scale_bounds = settings.scale_bounds,
+            use_log_scale = settings.use_log_scale,
+        )
+
+        output = fc.output_frame(
+            current = checked.current,
+            adjusted_forecast = adjusted,
+            date_col = config.date_col,
+            target_col = config.target_col,
+        )
+
+        result.output_path = os.path.join(settings.output_dir, output_name(path))
+        output.to_csv(result.output_path, index=False)
+
+    except Exception as e:
+        # One bad file shouldn't stop the rest
+        result.error = f"{type(e).__name__}: {str(e).strip()}"
+
+    result.seconds = time.perf_counter() - start
+
+    return result
+
+
+def run_batch(
+        paths: list[str],
+        settings: BatchSettings,
+        workers: int,
+        ) -> list[FileResult]:
+    """
+    Forecast every file across a pool of processes, printing
+    progress as each one finishes.
+    """
+
+    os.makedirs(settings.output_dir, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers = workers, initializer = jh.quiet_logging) as pool:
+        futures = {pool.submit(forecast_file, path, settings): path for path in paths}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # forecast_file catches its own errors, so this is the
+                # worker dying (i.e. running out of memory)
+                result = FileResult(path = futures[future], error = f"{type(e).__name__}: {str(e).strip()}")
+
+            results.append(result)
+
+            status = "failed" if result.error else "ok"
+            print(f"[{done}/{len(paths)}] {result.path}: {status} ({result.seconds:.1f}s)", flush=True)
+            if result.error:
+                print(f"    {result.error.splitlines()[0]}", flush=True)
+
+    return results
+
+
+def print_summary(
+        results: list[FileResult],
+        seconds: float,
+        ) -> None:
+
+    failed = [r for r in results if r.error]
+    rows = sum(r.rows for r in results if not r.error)
+
+    print(f"""
+Forecast {len(results) - len(failed)} of {len(results)} files in {seconds:.1f}s""")
+
+    if seconds > 0:
+        print(f"({len(results) / seconds:.2f} files/s, {rows / seconds:,.0f} rows/s)")
+
+    if failed:
+        print("\nThese files failed:")
+        for r in sorted(failed, key = lambda r: r.path):
+            print(f"- {r.path}: {r.error.splitlines()[0]}")
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(
+        description = "Forecast a directory (or glob) of CSVs with an adjusted trend.")
+
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns of csvs")
+    parser.add_argument("--date-col", required=True)
+    parser.add_argument("--target-col", required=True)
+    parser.add_argument("--regressor-cols", nargs="*", default=[])
+    parser.add_argument(
+        "--holiday-countries",
+        nargs="*",
+        default=[],
+        help="country codes (i.e. GB US) whose holidays to include")
+    parser.add_argument("--log-scale", action="store_true")
+    parser.add_argument(
+        "--duplicate-dates",
+        choices=["sum", "mean"],
+        default=None,
+        help="how to combine repeated dates (by default they're an error)")
+    parser.add_argument(
+        "--multiplier",
+        type=float,
+        default=1.0,
+        help="how much of the trend to keep, from 0 to 1 (default 1)")
+    parser.add_argument(
+        "--trend-schedule",
+        default=None,
+        help='trend percentages by days after the forecast starts, i.e. "0:100, 90:100, 1095:40" (used instead of --multiplier)')
+    parser.add_argument("--schedule-steps", action="store_true", help="jump between the steps in --trend-schedule rather than easing")
+    parser.add_argument("--fixed-bounds", action="store_true", help="don't scale the bounds with the trend")
+    parser.add_argument(
+        "--intervals",
+        choices=list(fc.INTERVAL_MODES),
+        default="full",
+        help="how accurately to work out the upper and lower bounds (none is quickest)")
+    parser.add_argument("--output-dir", default="forecasts")
+    parser.add_argument("--workers", type=int, default=jh.available_cores())
+    parser.add_argument("--no-cache", action="store_true", help="always refit models")
+
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+
+    args = parse_args(argv)
+
+    paths = find_files(args.inputs)
+    if not paths:
+        print("No csv files found.")
+        return 1
+
+    # Otherwise the last one to finish would overwrite the others
+    clashes = output_clashes(paths)
+    if clashes:
+        print("These files would all be written to the same forecast file, please rename them or run them separately:")
+        for name, clashing in clashes.items():
+            print(f"- {name}: {', '.join(clashing)}")
+        return 1
+
+    trend_schedule = None
+    if args.trend_schedule is not None:
+        try:
+            trend_schedule = fc.parse_trend_schedule(args.trend_schedule, ramp = not args.schedule_steps)
+        except ValueError as e:
+            print(str(e).strip())
+            return 1
+
+    settings = BatchSettings(
+        data_config = fc.DataConfig(
+            date_col = args.date_col,
+            target_col = args.target_col,
+            regressor_cols = args.regressor_cols,
+            duplicate_dates = args.duplicate_dates,
+        ),
+        holiday_countries = args.holiday_countries,
+        use_log_scale = args.log_scale,
+        multiplier = args.multiplier,
+        scale_bounds = not args.fixed_bounds,
+        output_dir = args.output_dir,
+        use_cache = not args.no_cache,
+        interval_mode = args.intervals,
+        trend_schedule = trend_schedule,
+    )
+
+    workers = max(1, min(args.workers, len(paths)))
+    print(f"Forecasting {len(paths)} files with {workers} workers")
+
+    start = time.perf_counter()
+    results = run_batch(paths = paths, settings = settings, workers = workers)
+    print_summary(results, time.perf_counter() - start)
+
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
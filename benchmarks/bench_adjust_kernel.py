@@ -0,0 +1,100 @@
+"""
+Benchmark for TrendLookup.adjusted in forecast_core, which goes from
+Prophet's forecast to the adjusted yhat and bounds on the scale of 
+the uploaded data in place (the trend adjustment, clipping and exp
+for log scale models).
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_adjust_kernel.py
+
+Compares the previous path (reverse_engineer_forecast_for_trend into
+a copy of the forecast, then untransform_forecast) with adjust_forecast
+(which builds a TrendLookup and fills one preallocated array), and
+with moving the slider in the app (a TrendLookup that's already built, 
+filling an array passed in as out), for long forecasts with and
+without the log scale.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forecast_core as fc
+
+from bench_reverse_engineer import make_forecast
+
+
+def previous_adjust(
+        forecast_df: pd.DataFrame,
+        multiplier: float,
+        scale_bounds: bool,
+        use_log_scale: bool,
+        ) -> pd.DataFrame:
+    # How adjust_forecast worked before it used TrendLookup
+    adjusted_columns = fc.reverse_engineer_forecast_for_trend(
+        forecast_df = forecast_df,
+        multiplier = multiplier,
+        scale_bounds = scale_bounds)
+
+    adjusted = forecast_df.copy()
+    for c in fc.ADJUSTED_COLUMNS:
+        adjusted[c] = adjusted_columns[f"{c}_adjusted"]
+
+    return fc.untransform_forecast(
+        df = adjusted,
+        columns_to_adjust = fc.ADJUSTED_COLUMNS,
+        use_log_scale = use_log_scale)
+
+
+def log_forecast(rows: int) -> pd.DataFrame:
+    # What Prophet gives back for log data is around log(y)
+    forecast = make_forecast(rows)
+    for c in forecast.columns.drop(["ds"]):
+        if not c.startswith("multiplicative_terms"):
+            forecast[c] = np.log(forecast[c])
+    return forecast
+
+
+def median_seconds(function, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(sizes: list[int], repeats: int = 20) -> None:
+
+    print(f"{'rows':>8} {'log':>5} {'before (ms)':>12} {'adjust_forecast (ms)':>21} {'slider (ms)':>12}")
+    for rows in sizes:
+        for use_log_scale in [False, True]:
+            forecast = log_forecast(rows) if use_log_scale else make_forecast(rows)
+            settings = dict(
+                forecast_df = forecast,
+                multiplier = 0.5,
+                scale_bounds = False,
+                use_log_scale = use_log_scale)
+
+            lookup = fc.trend_lookup(
+                forecast_df = forecast,
+                scale_bounds = False,
+                use_log_scale = use_log_scale)
+            out = np.empty_like(lookup.base)
+
+            before = median_seconds(lambda: previous_adjust(**settings), repeats)
+            adjust = median_seconds(lambda: fc.adjust_forecast(**settings), repeats)
+            slider = median_seconds(lambda: lookup.adjusted(0.5, out = out), repeats)
+
+            print(f"{rows:>8,} {str(use_log_scale):>5} {before * 1000:>12.3f} {adjust * 1000:>21.3f} {slider * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    # 80,000 days is about as far as pandas' dates go from 2024
+    main([365, 3_650, 36_500, 80_000])
@@ -0,0 +1,51 @@
+"""
+Benchmark for the uncertainty interval modes in forecast_core.predict.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_intervals.py
+
+Fits one model to the Peyton Manning example data, then prints how
+long predict takes in each interval mode for a few forecast horizons.
+"""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forecast_core as fc
+
+
+def main(horizons: list[int], repeats: int = 5) -> None:
+    for name in ["prophet", "cmdstanpy"]:
+        logging.getLogger(name).addFilter(lambda record: record.levelno >= logging.WARNING)
+
+    df = pd.read_csv("tests/test_files/example_wp_log_peyton_manning.csv", parse_dates=["ds"])
+    m = fc.fit_model(df = df, config = fc.ModelConfig(), use_cache = False)
+
+    modes = list(fc.INTERVAL_MODES)
+    print(f"{'days':>8}" + "".join(f"{mode + ' (s)':>14}" for mode in modes))
+
+    for days in horizons:
+        future = m.make_future_dataframe(periods = days, include_history = False)
+
+        seconds = {}
+        for mode in modes:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fc.predict(fitted_model = m, future_data = future, interval_mode = mode, use_cache = False)
+                times.append(time.perf_counter() - start)
+            seconds[mode] = float(np.median(times))
+
+        print(f"{days:>8,}" + "".join(f"{seconds[mode]:>14.3f}" for mode in modes))
+
+
+if __name__ == "__main__":
+    main([90, 365, 1_096, 3_650])
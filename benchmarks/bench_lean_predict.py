@@ -0,0 +1,65 @@
+"""
+Benchmark for the lean prediction in forecast_core.predict.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_lean_predict.py
+
+Fits a model to the Peyton Manning example data with and without
+holidays, then prints how long Prophet's full predict and the lean
+prediction take (with full intervals and without) and how many
+columns each one gives back.
+"""
+
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forecast_core as fc
+
+
+def time_predict(m, future: pd.DataFrame, interval_mode: str, lean: bool, repeats: int):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        forecast = fc.predict(
+            fitted_model = m, 
+            future_data = future, 
+            interval_mode = interval_mode, 
+            use_cache = False, 
+            lean = lean)
+        times.append(time.perf_counter() - start)
+
+    return float(np.median(times)), forecast.shape[1]
+
+
+def main(holiday_options: list[list[str]], days: int = 365, repeats: int = 5) -> None:
+    for name in ["prophet", "cmdstanpy"]:
+        logging.getLogger(name).addFilter(lambda record: record.levelno >= logging.WARNING)
+
+    df = pd.read_csv("tests/test_files/example_wp_log_peyton_manning.csv", parse_dates=["ds"])
+
+    print(f"{'holidays':>10} {'intervals':>10} {'full (s)':>10} {'lean (s)':>10} {'speed up':>10} {'columns':>10}")
+    for countries in holiday_options:
+        m = fc.fit_model(
+            df = df, 
+            config = fc.ModelConfig(holiday_countries = countries), 
+            use_cache = False)
+        future = m.make_future_dataframe(periods = days, include_history = False)
+
+        for interval_mode in ["none", "full"]:
+            full_seconds, full_columns = time_predict(m, future, interval_mode, lean = False, repeats = repeats)
+            lean_seconds, lean_columns = time_predict(m, future, interval_mode, lean = True, repeats = repeats)
+
+            label = "+".join(countries) or "None"
+            print(f"{label:>10} {interval_mode:>10} {full_seconds:>10.3f} {lean_seconds:>10.3f} {full_seconds / lean_seconds:>9.1f}x {f'{full_columns} -> {lean_columns}':>10}")
+
+
+if __name__ == "__main__":
+    main([[], ["GB"], ["US", "GB"]])
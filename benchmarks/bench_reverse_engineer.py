@@ -0,0 +1,109 @@
+"""
+Benchmark for forecast_core.reverse_engineer_forecast_for_trend.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_reverse_engineer.py
+
+Compares the current version (which leaves the forecast alone and
+returns arrays) with the previous one (which added its working
+columns to the forecast), timing each call and measuring how much
+memory it allocates at its peak.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forecast_core as fc
+
+
+def previous_reverse_engineer(
+        forecast_df: pd.DataFrame,
+        multiplier: float,
+        scale_bounds: bool,
+        ) -> pd.DataFrame:
+    # The version before it stopped changing forecast_df, for comparison
+    list_to_scale = [""]
+    list_to_manually_adjust = ["_lower", "_upper"]
+
+    if scale_bounds:
+        list_to_scale = ["", "_lower", "_upper"]
+        list_to_manually_adjust = []
+
+    for line in list_to_scale:
+        first_trend_val = forecast_df[f"trend{line}"].iloc[0]
+        forecast_df[f"yhat{line}_fixed_trend"] = first_trend_val
+        forecast_df[f"yhat{line}_zero_trend"] = first_trend_val
+        forecast_df[f"yhat{line}_zero_trend"] *= 1+ forecast_df[f"multiplicative_terms{line}"]
+        forecast_df[f"{line}_trend_diff"] = forecast_df[f"yhat{line}"]-forecast_df[f"yhat{line}_zero_trend"]
+        forecast_df[f"{line}_trend_diff_to_use"] = forecast_df[f"{line}_trend_diff"]*multiplier
+        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}_zero_trend"]+forecast_df[f"{line}_trend_diff_to_use"]
+
+    for line in list_to_manually_adjust:
+        yhat_diff = forecast_df["yhat_adjusted"]-forecast_df["yhat"]
+        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}"]-yhat_diff
+        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}_adjusted"].clip(lower = 0)
+
+    return forecast_df
+
+
+def make_forecast(rows: int) -> pd.DataFrame:
+    # The columns the adjustment reads, with a rising trend and weekly pattern
+    t = np.arange(rows)
+    trend = 100 + 0.1 * t
+    seasonal = 0.1 * np.sin(2 * np.pi * t / 7)
+    yhat = trend * (1 + seasonal)
+
+    return pd.DataFrame({
+        "ds": pd.date_range("2024-01-01", periods = rows, freq = "D"),
+        "trend": trend,
+        "trend_lower": trend * 0.95,
+        "trend_upper": trend * 1.05,
+        "multiplicative_terms": seasonal,
+        "multiplicative_terms_lower": seasonal,
+        "multiplicative_terms_upper": seasonal,
+        "yhat": yhat,
+        "yhat_lower": yhat * 0.9,
+        "yhat_upper": yhat * 1.1,
+    })
+
+
+def measure(function, forecast: pd.DataFrame, copy_input: bool, repeats: int):
+    times = []
+    for _ in range(repeats):
+        # The previous version needs its own copy, or the columns pile up
+        df = forecast.copy() if copy_input else forecast
+        start = time.perf_counter()
+        function(forecast_df = df, multiplier = 0.5, scale_bounds = False)
+        times.append(time.perf_counter() - start)
+
+    df = forecast.copy() if copy_input else forecast
+    tracemalloc.start()
+    function(forecast_df = df, multiplier = 0.5, scale_bounds = False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return float(np.median(times)), peak
+
+
+def main(sizes: list[int], repeats: int = 50) -> None:
+
+    print(f"{'rows':>8} {'before (ms)':>12} {'after (ms)':>12} {'before (KB)':>12} {'after (KB)':>12}")
+    for rows in sizes:
+        forecast = make_forecast(rows)
+
+        before_seconds, before_peak = measure(previous_reverse_engineer, forecast, copy_input = True, repeats = repeats)
+        after_seconds, after_peak = measure(fc.reverse_engineer_forecast_for_trend, forecast, copy_input = False, repeats = repeats)
+
+        print(f"{rows:>8,} {before_seconds * 1000:>12.3f} {after_seconds * 1000:>12.3f} {before_peak / 1024:>12,.0f} {after_peak / 1024:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main([365, 3_650, 36_500])
@@ -0,0 +1,100 @@
+"""
+Memory benchmark for splitting checked data into current and future
+rows (pandas_helpers.split_at_boundary), compared to the old approach 
+of filtering with .isin() on a list of empty dates and concatenating
+the generated future rows onto a copy.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_split_memory.py
+
+Prints the memory kept alive by the current, future and
+current_plus_future frames for each approach.
+"""
+
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas_helpers as pdh
+
+
+def make_data(rows: int, empty_rows: int, regressors: int = 3) -> pd.DataFrame:
+    dates = pd.date_range("2000-01-01", periods=rows, freq="H")
+    df = pd.DataFrame({
+        "ds": dates,
+        "raw_date": dates,
+        "y": np.random.default_rng(0).random(rows),
+    })
+    for i in range(regressors):
+        df[f"regressor_{i}"] = 1.0
+
+    if empty_rows > 0:
+        df.loc[df.index[-empty_rows:], "y"] = np.nan
+
+    return df
+
+
+def old_split(df: pd.DataFrame, future_rows: pd.DataFrame):
+    if len(future_rows) == 0:
+        list_of_empty_dates = df.loc[df["y"].isna(), "raw_date"].tolist()
+        current = df[~df["raw_date"].isin(list_of_empty_dates)]
+        future = df[df["raw_date"].isin(list_of_empty_dates)]
+        return current, future, df
+
+    return df, future_rows, pd.concat([df, future_rows])
+
+
+def new_split(df: pd.DataFrame, future_rows: pd.DataFrame):
+    if len(future_rows) == 0:
+        forecast_start = len(df) - int(df["y"].isna().sum())
+        current_plus_future = df
+    else:
+        forecast_start = len(df)
+        current_plus_future = pd.concat([df, future_rows], ignore_index=True)
+
+    current, future = pdh.split_at_boundary(current_plus_future, forecast_start)
+    return current, future, current_plus_future
+
+
+def measure(split, rows: int, future: int, generate_future: bool) -> int:
+    # Build the inputs while tracing and then drop our references
+    # to them, so we only count what the split keeps alive
+    tracemalloc.start()
+
+    df = make_data(rows, empty_rows=0 if generate_future else future)
+    future_rows = make_future_rows(df, future if generate_future else 0)
+    result = split(df, future_rows)
+    del df, future_rows
+
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return held
+
+
+def make_future_rows(df: pd.DataFrame, future: int) -> pd.DataFrame:
+    new_dates = pd.date_range(df["ds"].iloc[-1], periods=future + 1, freq="H")[1:]
+    return pd.DataFrame({"ds": new_dates, "raw_date": new_dates, "y": np.nan})
+
+
+def main(rows: int = 1_000_000, future: int = 365 * 24) -> None:
+    input_mb = make_data(rows, empty_rows=future).memory_usage(deep=True).sum() / 1e6
+
+    print(f"Input data: {rows:,} rows, {input_mb:.1f}MB")
+    print(f"{'case':<28} {'old MB':>10} {'new MB':>10}")
+    for case, generate_future in [
+            ("blank rows uploaded", False),
+            ("future rows generated", True)]:
+        old_mb = measure(old_split, rows, future, generate_future) / 1e6
+        new_mb = measure(new_split, rows, future, generate_future) / 1e6
+        print(f"{case:<28} {old_mb:>10.1f} {new_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark for the column-wise data block checks in
+pandas_helpers.check_for_data_blocks.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_validation.py
+
+Prints the time taken for each size, along with the time per row,
+which should stay roughly flat as the number of rows grows (i.e. the
+checks scale linearly).
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas_helpers as pdh
+
+
+def make_data(rows: int, regressors: int = 3, empty_rows: int = 365) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "raw_date": pd.date_range("2000-01-01", periods=rows, freq="min"),
+        "y": np.random.default_rng(0).random(rows),
+    })
+    for i in range(regressors):
+        df[f"regressor_{i}"] = 1.0
+
+    # Leave some rows at the end for the forecast
+    df.loc[df.index[-empty_rows:], "y"] = np.nan
+
+    return df
+
+
+def main(sizes: list[int]) -> None:
+    print(f"{'rows':>12} {'seconds':>10} {'ns/row':>10}")
+    for rows in sizes:
+        df = make_data(rows)
+        regressor_cols = [c for c in df.columns if c.startswith("regressor")]
+
+        start = time.perf_counter()
+        pdh.check_for_data_blocks(
+            df = df,
+            target_column = "y",
+            date_column = "raw_date",
+            regressor_column_list = regressor_cols,
+        )
+        seconds = time.perf_counter() - start
+
+        print(f"{rows:>12,} {seconds:>10.3f} {seconds/rows*1e9:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([10_000, 100_000, 1_000_000, 10_000_000])
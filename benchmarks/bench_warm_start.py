@@ -0,0 +1,91 @@
+"""
+Benchmark for warm started refits in forecast_core.fit_model.
+
+Run from the root of the repo with:
+
+    python benchmarks/bench_warm_start.py
+
+For each size we fit a model to all but the last 30 days (which goes
+in the cache), then fit the full data from scratch and again starting
+from the cached model. Prints both fit times and the largest difference
+between the two forecasts (relative to the size of the forecast).
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_helpers as cah
+import forecast_core as fc
+
+
+def make_data(rows: int) -> pd.DataFrame:
+    dates = pd.date_range("2010-01-01", periods=rows, freq="D")
+    t = np.arange(rows)
+    rng = np.random.default_rng(0)
+
+    y = (
+        100
+        + 0.05 * t
+        + 10 * np.sin(2 * np.pi * t / 7)
+        + 20 * np.sin(2 * np.pi * t / 365.25)
+        + rng.normal(0, 3, rows)
+    )
+
+    return pd.DataFrame({"ds": dates, "y": y})
+
+
+def time_fit(df: pd.DataFrame, config: fc.ModelConfig, warm_start: bool):
+    start = time.perf_counter()
+    m = fc.fit_model(df = df, config = config, use_cache = True, warm_start = warm_start)
+    return m, time.perf_counter() - start
+
+
+def main(sizes: list[int], new_rows: int = 30, repeats: int = 3) -> None:
+    for name in ["prophet", "cmdstanpy"]:
+        logging.getLogger(name).addFilter(lambda record: record.levelno >= logging.WARNING)
+
+    config = fc.ModelConfig(data_frequency = "D")
+
+    print(f"{'rows':>8} {'cold (s)':>10} {'warm (s)':>10} {'speed up':>10} {'max diff':>10}")
+    for rows in sizes:
+        df = make_data(rows)
+        cold_times, warm_times, diffs = [], [], []
+
+        for _ in range(repeats):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cah.CACHE_DIR = cache_dir
+
+                # Last month's model
+                fc.fit_model(df = df.iloc[:-new_rows], config = config, use_cache = True)
+
+                cold, cold_seconds = time_fit(df, config, warm_start = False)
+
+                # Clear the full data model, but keep last month's
+                os.remove(cah.cache_path("models", fc.model_cache_key(df, config), ".json"))
+
+                warm, warm_seconds = time_fit(df, config, warm_start = True)
+
+            future = cold.make_future_dataframe(periods = 365)
+            cold_yhat = cold.predict(future)["yhat"].to_numpy()
+            warm_yhat = warm.predict(future)["yhat"].to_numpy()
+
+            cold_times.append(cold_seconds)
+            warm_times.append(warm_seconds)
+            diffs.append(np.abs(cold_yhat - warm_yhat).max() / np.abs(cold_yhat).mean())
+
+        cold_seconds = float(np.median(cold_times))
+        warm_seconds = float(np.median(warm_times))
+
+        print(f"{rows:>8,} {cold_seconds:>10.2f} {warm_seconds:>10.2f} {cold_seconds / warm_seconds:>9.1f}x {max(diffs):>10.2e}")
+
+
+if __name__ == "__main__":
+    main([365, 1_000, 3_000, 10_000])
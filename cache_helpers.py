@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+from typing import Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa # type: ignore
+import pyarrow.parquet as pq # type: ignore
+
+
+# Where cached files are kept, and how big the cache can get
+# before we start removing the least recently used files
+CACHE_DIR = os.getenv("TRENDS_ADJUST_CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("TRENDS_ADJUST_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+# Key for the extra information we store alongside a cached dataframe
+METADATA_KEY = b"trends_adjust"
+
+
+def hash_key(*parts) -> str:
+    """
+    Create a key for the cache from any number of parts.
+
+    Bytes are hashed as they are, anything else is converted to
+    json first (so lists of column names etc. can be included).
+    """
+
+    hasher = hashlib.sha256()
+
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+
+        # Include the length so ("ab", "c") doesn't match ("a", "bc")
+        hasher.update(len(part).to_bytes(8, "little"))
+        hasher.update(part)
+
+    return hasher.hexdigest()
+
+
+def hash_file(
+        file,
+        block_size: int = 1024 * 1024,
+        ) -> str:
+    """
+    Hash the contents of a file (either a path or a file-like
+    object) a block at a time.
+    """
+
+    hasher = hashlib.sha256()
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                hasher.update(block)
+    else:
+        file.seek(0)
+        for block in iter(lambda: file.read(block_size), b""):
+            hasher.update(block)
+        file.seek(0)
+
+    return hasher.hexdigest()
+
+
+def cache_path(
+        namespace: str,
+        key: str,
+        suffix: str,
+        cache_dir: Optional[str] = None,
+        ) -> str:
+
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+
+    return os.path.join(cache_dir, namespace, f"{key}{suffix}")
+
+
+def save_frame(
+        df: pd.DataFrame,
+        namespace: str,
+        key: str,
+        metadata: Optional[dict] = None,
+        cache_dir: Optional[str] = None,
+        ) -> None:
+    """
+    Save a dataframe to the cache as a parquet file, with an
+    optional dictionary of extra information stored alongside it.
+    """
+
+    path = cache_path(namespace, key, ".parquet", cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps(metadata or {}).encode("utf-8"),
+    })
+
+    # Write to a temporary file first so nobody can read
+    # a half written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, path)
+
+    evict_cache(cache_dir = cache_dir)
+
+
+def load_frame(
+        namespace: str,
+        key: str,
+        cache_dir: Optional[str] = None,
+        ) -> Optional[Tuple[pd.DataFrame, dict]]:
+    """
+    Load a dataframe (and the information stored with it) from the cache.
+
+    Returns None if there's nothing cached for that key.
+    """
+
+    path = cache_path(namespace, key, ".parquet", cache_dir)
+
+    try:
+        table = pq.read_table(path)
+    except FileNotFoundError:
+        return None
+
+    _touch(path)
+
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+
+    return table.to_pandas(), metadata
+
+
+def save_bytes(
+        data: bytes,
+        namespace: str,
+        key: str,
+        suffix: str = ".bin",
+        cache_dir: Optional[str] = None,
+        ) -> None:
+    """
+    Save anything that isn't a dataframe (i.e. a serialised model) to the cache.
+    """
+
+    path = cache_path(namespace, key, suffix, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+    evict_cache(cache_dir = cache_dir)
+
+
+def load_bytes(
+        namespace: str,
+        key: str,
+        suffix: str = ".bin",
+        cache_dir: Optional[str] = None,
+        ) -> Optional[bytes]:
+    """
+    Load something saved with save_bytes, or None if it's not cached.
+    """
+
+    path = cache_path(namespace, key, suffix, cache_dir)
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    _touch(path)
+
+    return data
+
+
+def _touch(path: str) -> None:
+    # Mark the file as recently used so it's the last to be evicted
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def evict_cache(
+        max_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        ) -> None:
+    """
+    Remove the least recently used files until the whole cache
+    is smaller than max_bytes.
+    """
+
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+
+    cached_files = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith(".tmp"):
+                # Still being written
+                continue
+            path = os.path.join(root, name)
+            try:
+                stats = os.stat(path)
+            except FileNotFoundError:
+                continue
+            cached_files.append((stats.st_mtime, stats.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in cached_files)
+
+    # Oldest first
+    for _, size, path in sorted(cached_files):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
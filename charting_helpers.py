@@ -1,7 +1,23 @@
+import os
+from typing import Optional
+
 import plotly.graph_objects as go  # type: ignore
 import pandas as pd
 import numpy as np
 import streamlit as st
+import streamlit.components.v1 as components
+
+import cache_helpers as cah
+import forecast_core as fc
+
+
+# Set TRENDS_ADJUST_BROWSER_SLIDER=no to use Streamlit's own slider
+# (which reruns the app every time it moves)
+BROWSER_SLIDER = os.getenv("TRENDS_ADJUST_BROWSER_SLIDER", "yes") == "yes"
+
+_trend_slider_component = components.declare_component(
+    "trend_slider",
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "trend_slider"))
 
 
 def line_plot_highlighting_missing_sections(
@@ -111,3 +127,97 @@ def visualise_forecast(
 
     # Return the figure
     return fig
+
+
+def _json_values(values) -> list:
+    # Blanks as None, as NaN isn't valid json
+    values = np.asarray(values, dtype=float)
+    as_objects = values.astype(object)
+    as_objects[np.isnan(values)] = None
+    return as_objects.tolist()
+
+
+def _trend_slider_data(
+        lookup: fc.TrendLookup,
+        for_chart: pd.DataFrame,
+        history_rows: int,
+        ) -> dict:
+    # Everything the slider needs to draw and adjust the forecast
+    dates = for_chart["ds"].astype(str).tolist()
+
+    return {
+        "history_dates": dates[:history_rows],
+        "forecast_dates": dates[history_rows:],
+        "actual": _json_values(for_chart["y"].iloc[:history_rows]),
+        "base": [_json_values(line) for line in lookup.base],
+        "slope": [_json_values(line) for line in lookup.slope],
+        "clip": lookup.clip.tolist(),
+        "use_log_scale": lookup.use_log_scale,
+    }
+
+
+def trend_slider(
+        lookup: fc.TrendLookup,
+        for_chart: pd.DataFrame,
+        history_rows: int,
+        value: int,
+        columns: list[str],
+        file_name: str,
+        key: str = "trend_slider",
+        ) -> Optional[int]:
+    """
+    A trend slider with its own chart and download, which adjusts
+    the forecast in the browser as it moves (see 
+    components/trend_slider/index.html).
+
+    for_chart is the history followed by the forecast rows (only ds
+    and y are used), columns are the download's column names and 
+    {percent} in file_name is replaced with the slider value.
+
+    The forecast is only built and sent to the browser once (Streamlit
+    sends a component's arguments on every rerun), after that it's
+    just the data_key, unless the browser asks for it again (i.e. 
+    the component was hidden and has been drawn from scratch).
+
+    Returns the trend percentage the user last chose with "Use this 
+    trend", or None if they haven't.
+    """
+
+    cached = st.session_state.get(f"{key}_data")
+
+    if cached is None or cached["lookup"] is not lookup or cached["for_chart"] is not for_chart:
+        data = _trend_slider_data(lookup, for_chart, history_rows)
+        cached = {
+            "lookup": lookup,
+            "for_chart": for_chart,
+            "data": data,
+            # So the browser knows when it's a different forecast
+            "data_key": cah.hash_key(lookup.base.tobytes(), lookup.slope.tobytes(), lookup.use_log_scale, data["forecast_dates"]),
+            "sent": False,
+            "handled_request": None,
+        }
+        st.session_state[f"{key}_data"] = cached
+
+    component_value = _trend_slider_component(
+        data = None if cached["sent"] else cached["data"],
+        data_key = cached["data_key"],
+        value = value,
+        columns = columns,
+        file_name = file_name,
+        key = key,
+        default = None,
+    )
+    cached["sent"] = True
+
+    if not isinstance(component_value, dict):
+        return None
+
+    # The browser doesn't have the forecast (component values stay the
+    # same until the next one is sent, so each request is only handled once)
+    request = component_value.get("need_data")
+    if request is not None and request != cached["handled_request"]:
+        cached["handled_request"] = request
+        cached["sent"] = False
+        st.experimental_rerun()
+
+    return component_value.get("percent")
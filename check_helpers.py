@@ -0,0 +1,813 @@
+import pandas as pd
+import numpy as np
+import date_helpers as dh
+from typing import Tuple, Union
+
+
+# Number of rows we read at a time when streaming uploaded csvs
+CSV_CHUNK_ROWS = 100_000
+
+
+def _rewind(file) -> None:
+    # Uploaded files are file-like objects which we read more than
+    # once, so make sure we start from the top each time
+    if hasattr(file, "seek"):
+        file.seek(0)
+
+
+def read_csv_header(file) -> pd.DataFrame:
+    """
+    Read just the header row of a csv, without any of the data.
+
+    pandas renames duplicate column names when it reads a csv
+    (i.e. "y" and "y.1") so we read the header as a normal row
+    to keep the names exactly as the user wrote them, which means
+    check_columns can spot duplicates before we read anything else.
+    """
+
+    _rewind(file)
+    header = pd.read_csv(file, header=None, nrows=1, dtype=str)
+    _rewind(file)
+
+    return pd.DataFrame(columns=header.iloc[0].tolist())
+
+
+def preview_csv(
+        file,
+        rows: int = 5,
+        chunksize: int = CSV_CHUNK_ROWS,
+        ) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    Stream through a csv a chunk at a time and keep only the first 
+    and last few rows (plus a count of rows) so we can show the user
+    what they uploaded without holding the whole file in memory.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, int]: first rows, last rows, total row count
+    """
+
+    _rewind(file)
+
+    head: pd.DataFrame = pd.DataFrame()
+    tail: pd.DataFrame = pd.DataFrame()
+    row_count = 0
+
+    for chunk in pd.read_csv(file, chunksize=chunksize):
+        if row_count == 0:
+            head = chunk.head(rows)
+        tail = pd.concat([tail, chunk.tail(rows)]).tail(rows)
+        row_count += len(chunk)
+
+    _rewind(file)
+
+    return head, tail, row_count
+
+
+def read_csv_in_chunks(
+        file,
+        date_col: str,
+        numeric_cols: list[str],
+        chunksize: int = CSV_CHUNK_ROWS,
+        series_col: Union[str, None] = None,
+        ) -> pd.DataFrame:
+    """
+    Read only the columns we need from an uploaded csv, a chunk at a time.
+
+    Each chunk has its dates parsed and its target/regressor columns
+    converted to numbers as soon as it's read, so if there's a problem
+    with the data we stop at the first bad chunk rather than after 
+    we've read the whole file. Only the compact, converted chunks are
+    kept, so memory stays around one raw chunk plus the final data.
+
+    Args:
+        file: path or file-like object for the csv
+        date_col (str): the name of the date column
+        numeric_cols (list[str]): target and regressor columns to convert to numbers
+        chunksize (int): the number of rows to read at a time
+        series_col (str): for long format data, the column saying which series each row is in
+
+    Returns:
+        pd.DataFrame: the date, series and numeric columns, with converted types
+    """
+
+    _rewind(file)
+
+    usecols = [date_col] + [c for c in numeric_cols if c != date_col]
+    dtypes = {date_col: str}
+
+    # Series names are kept as text, even if they look like numbers
+    if series_col is not None:
+        usecols.append(series_col)
+        dtypes[series_col] = str
+
+    # Worked out from the first chunk, then used for the rest. If a later
+    # chunk doesn't fit it (i.e. the first chunk only had days up to 12,
+    # so the day/month order was a guess) we work it out again from that
+    # chunk and start over, so every chunk is read the same way
+    date_format = None
+    tried_formats = set()
+
+    while True:
+        _rewind(file)
+        converted_chunks: list[pd.DataFrame] = []
+        rows_read = 0
+        restart_format = None
+
+        reader = pd.read_csv(
+            file, 
+            usecols = usecols, 
+            dtype = dtypes,
+            chunksize = chunksize,
+            )
+
+        for chunk in reader:
+
+            # Blank dates are fine at this point (they get a clearer error
+            # message later on) but anything else that won't convert isn't
+            parsed_dates, first_failed_row, chunk_format = dh.parse_dates(
+                chunk[date_col], 
+                date_format = date_format)
+
+            if first_failed_row is not None and date_format is not None:
+                _, redetected_failed_row, redetected_format = dh.parse_dates(chunk[date_col])
+                if redetected_failed_row is None and redetected_format not in tried_formats:
+                    restart_format = redetected_format
+                    break
+
+            if first_failed_row is not None:
+                raise date_parsing_error(
+                    date_col = date_col, 
+                    row = rows_read + first_failed_row, 
+                    value = chunk[date_col].iloc[first_failed_row])
+
+            date_format = chunk_format
+            tried_formats.add(date_format)
+
+            if series_col is not None:
+                # Chunks carry on the row numbers from the one before
+                check_series_ids(chunk[series_col], series_column = series_col)
+
+            chunk[date_col] = parsed_dates
+
+            columns_to_numbers(
+                df = chunk, 
+                column_names = {_col: _col for _col in numeric_cols})
+
+            converted_chunks.append(chunk)
+            rows_read += len(chunk)
+
+        if restart_format is None:
+            break
+
+        date_format = restart_format
+
+    _rewind(file)
+
+    if len(converted_chunks) == 0:
+        return pd.DataFrame(columns=usecols)
+
+    return pd.concat(converted_chunks, ignore_index=True)
+
+
+def date_parsing_error(
+        date_col: str,
+        row: int,
+        value,
+        ) -> ValueError:
+
+    return ValueError(f"There was a problem with reading your date column ({date_col}) at row {row} ('{value}') - please make sure you've selected the right one, and that all the dates are in the same format (i.e. YYYY-MM-DD or DD/MM/YYYY)")
+
+
+def date_col_conversion(
+        df: pd.DataFrame, 
+        date_col: str
+        )-> pd.DataFrame:
+
+    parsed_dates, first_failed_row, _ = dh.parse_dates(df[date_col])
+
+    if first_failed_row is not None:
+        raise date_parsing_error(
+            date_col = date_col, 
+            row = first_failed_row, 
+            value = df[date_col].iloc[first_failed_row])
+
+    # assign gives a new frame, so the caller's one (which may be a slice) isn't changed
+    df = df.assign(raw_date = parsed_dates)
+
+    # Prophet reads the ds column itself, so give it the converted
+    # dates rather than leaving it to guess the format
+    df = df.rename(columns={date_col:"ds"}, inplace = False)
+    df["ds"] = parsed_dates
+    
+    return df
+
+
+def check_for_data_blocks(
+        df: pd.DataFrame,
+        target_column: str,
+        date_column: str,
+        regressor_column_list: list[str],
+    ) -> int:
+    """
+    check_for_data_blocks 
+
+    This function checks every row of the dataframe in a few
+    column-wise passes (rather than looping through row by row)
+    and finds where the empty rows start, while ALSO doing
+    some checks, i.e.
+    
+    - Make sure that there aren't gaps 
+        (essentially we should see ONLY filled 
+        rows until the first empty row, and then we 
+        should see ONLY empty rows from then until the end). 
+    - Check if there are at least a few empty 'target_column' 
+        rows at the end of our data, if so that's our forecast
+        window, if not we assume we have to generate the forecast window
+    - Check if there are any regressor columns with empty spaces
+        if so that'll cause Prophet to fail so we need to give a 
+        clear and direct error message now so people know what to fix
+    - Check if there are any empty cells in the date column
+        if so that'll cause Prophet to fail so again we need a 
+        clear and direct error message
+
+    The errors are the same ones we'd get if we went through the rows
+    in order and stopped at the first problem, so whichever problem row
+    comes first in the data is the one we report.
+
+    Args:
+        df (DataFrame): the dataframe we're checking
+        target_column (str): the name of the column we're checking
+        date_column (str): the name of the column we'll record in the empty rows list
+        regressor_column_list (list[str]): list of regressor columns to check to make sure they're not N/A
+
+    Returns:
+        int: the position of the first empty row (i.e. where the 
+            forecast starts), which is the number of rows if there
+            aren't any empty rows
+    """
+
+    forecast_starts = _find_data_blocks(
+        df = df,
+        target_column = target_column,
+        date_column = date_column,
+        regressor_column_list = regressor_column_list,
+        group_starts = np.array([0]),
+        )
+
+    return int(forecast_starts[0])
+
+
+def check_for_data_blocks_by_series(
+        df: pd.DataFrame,
+        target_column: str,
+        date_column: str,
+        regressor_column_list: list[str],
+        series_column: str,
+    ) -> pd.DataFrame:
+    """
+    The same checks as check_for_data_blocks, but for long format
+    data with more than one series, where each series has its own
+    filled rows followed by its own empty rows. All the series are 
+    checked together in one go.
+
+    Expects the data to be grouped by series (and in date order
+    within each series).
+
+    Returns:
+        pd.DataFrame: the position of the first row, the first empty row 
+            and the end of each series, indexed by the series
+    """
+
+    series_bounds = find_series_bounds(df = df, series_column = series_column)
+
+    forecast_starts = _find_data_blocks(
+        df = df,
+        target_column = target_column,
+        date_column = date_column,
+        regressor_column_list = regressor_column_list,
+        group_starts = series_bounds["start"].to_numpy(),
+        series_column = series_column,
+        )
+
+    series_bounds["forecast_start"] = forecast_starts
+
+    return series_bounds[["start", "forecast_start", "end"]]
+
+
+def check_series_ids(
+        series: pd.Series,
+        series_column: str,
+        ) -> None:
+    """
+    Make sure every row says which series it's in, rather than 
+    forecasting the rows without one as a series of their own.
+    """
+
+    blank = _blank_mask(series)
+
+    if not blank.any():
+        return
+
+    position = int(np.argmax(blank))
+    row_label = series.index[position]
+
+    raise ValueError(f"""
+
+It looks like you have a row which doesn't have a value in the series column
+({series_column}). Try checking row {row_label} and make sure every row says which
+series it belongs to (and check the rest of the column while you're at it!)
+
+Then refresh this page and try uploading your data again.
+""")
+
+
+def find_series_bounds(
+        df: pd.DataFrame,
+        series_column: str,
+        ) -> pd.DataFrame:
+    """
+    Find where each series starts and ends, for data which
+    is grouped by series.
+
+    Returns:
+        pd.DataFrame: start and end positions, indexed by the series
+    """
+
+    check_series_ids(df[series_column], series_column = series_column)
+
+    series = df[series_column].to_numpy()
+    codes = pd.factorize(series)[0]
+
+    starts = np.flatnonzero(np.diff(codes, prepend=-1) != 0)
+    ends = np.append(starts[1:], len(df))
+
+    return pd.DataFrame(
+        {"start": starts, "end": ends},
+        index = pd.Index(series[starts], name=series_column),
+        )
+
+
+def _find_data_blocks(
+        df: pd.DataFrame,
+        target_column: str,
+        date_column: str,
+        regressor_column_list: list[str],
+        group_starts: np.ndarray,
+        series_column: Union[str, None] = None,
+    ) -> np.ndarray:
+    # Does the work for check_for_data_blocks (and the by series 
+    # version), group_starts are the positions where each series
+    # starts. Returns the position of the first empty row for each series.
+
+    if len(df) == 0:
+        return group_starts
+
+    date_blank = _blank_mask(df[date_column])
+    regressor_blanks = [_blank_mask(df[c]) for c in regressor_column_list]
+    target_blank = _blank_mask(df[target_column])
+
+    # A filled target after any empty target (in the same series) is a 
+    # gap, the cumulative count tells us how many empties came before each 
+    # row, and we take off the count from before the series started
+    group_lengths = np.diff(np.append(group_starts, len(df)))
+    empties_before = np.cumsum(target_blank) - target_blank
+    empties_before = empties_before - np.repeat(empties_before[group_starts], group_lengths)
+    gap = ~target_blank & (empties_before > 0)
+
+    any_problem = date_blank | gap
+    for regressor_blank in regressor_blanks:
+        any_problem = any_problem | regressor_blank
+
+    if any_problem.any():
+        # Position of the first row which would have failed
+        position = int(np.argmax(any_problem))
+        row_label = df.index[position]
+
+        # Let the user know which series the problem is in
+        series_message = ""
+        if series_column is not None:
+            series_message = f"(This is in the series '{df[series_column].iloc[position]}' from your column '{series_column}'.)"
+
+        # Check if the date column is unexpectedly blank
+        if date_blank[position]:
+            raise ValueError(f"""
+
+It looks like you have a row which has data in it but doesn't have a value
+in the date column ({date_column}). Try checking row {row_label} and make sure
+the date column is filled (and check the rest of the date column while you're at it!)                         
+
+Then refresh this page and try uploading your data again.
+{series_message}                         
+""")
+
+        date_value = df[date_column].iloc[position]
+
+        # check if any of the regressor columns are unexpectedly blank
+        for c, regressor_blank in zip(regressor_column_list, regressor_blanks):
+            if regressor_blank[position]:
+                raise ValueError(f"""
+When you're using regressor columns - you have to put a value in every single row
+for the regressors. In the row for {date_value} your regressor column {c} is empty. 
+Other rows and columns might have the same issue so please check your data, refresh this page
+and try again.{series_message}""")
+
+        # Otherwise it's a gap
+        group_start = group_starts[np.searchsorted(group_starts, position, side="right") - 1]
+        list_of_empties = df[date_column].iloc[group_start:position][target_blank[group_start:position]].tolist()
+        raise ValueError(f"""
+                             
+You have gaps in your data - when we checked your data, column: {target_column}
+has an entry for date {date_value} but is missing values for {len(list_of_empties)} 
+preceding dates. Here are {min(10,len(list_of_empties))} examples of dates with missing data:
+{list_of_empties[:10]}.
+
+To avoid errors - fix your data (so you have a value in your target column for every
+historic date, and an empty row for every date you want to forecast), reload this page
+and reupload your data.
+{series_message}
+""")
+
+    # No gaps means all the empty rows are at the end of each series
+    group_ends = group_starts + group_lengths
+    return group_ends - np.add.reduceat(target_blank.astype(np.int64), group_starts)
+
+
+def _blank_mask(col: pd.Series) -> np.ndarray:
+    # Empty cells come through as NaN (or empty strings
+    # if the column has been read as text)
+    blank = col.isna().to_numpy()
+    if col.dtype == object or isinstance(col.dtype, pd.StringDtype):
+        blank = blank | (col == "").to_numpy()
+    return blank
+
+
+# Ways we can combine rows which have the same date, 
+# None means we stop and ask the user to fix their data
+DUPLICATE_DATE_OPTIONS: dict[str, Union[str, None]] = {
+    "Stop and show an error": None,
+    "Add them together": "sum",
+    "Take the average": "mean",
+}
+
+
+def find_date_issues(
+        dates: pd.Series,
+        series: Union[pd.Series, None] = None,
+        ) -> Tuple[bool, int]:
+    """
+    Check whether the dates are in order, and count how many
+    are duplicates, without sorting anything.
+
+    For long format data (with a series column) "in order" means
+    grouped by series, and in date order within each series, and a
+    duplicate is a date that's repeated in the same series.
+
+    Returns:
+        Tuple[bool, int]: whether the dates are in order, number of duplicate dates
+    """
+
+    values = dates.to_numpy(dtype="datetime64[ns]").view("i8")
+    gaps = np.diff(values)
+
+    if series is None:
+        same_series = np.ones(len(gaps), dtype=bool)
+        new_series = ~same_series
+    else:
+        # Codes count up in the order each series first appears, so
+        # they only go down if a series comes back after another one
+        series_steps = np.diff(pd.factorize(series)[0])
+        same_series = series_steps == 0
+        new_series = series_steps > 0
+
+    date_ordered = bool((new_series | (same_series & (gaps >= 0))).all()) and not dates.isna().any()
+
+    if date_ordered:
+        # If the dates are in order any duplicates are next to each other
+        duplicate_count = int((same_series & (gaps == 0)).sum())
+    elif series is None:
+        duplicate_count = int(dates.duplicated().sum())
+    else:
+        duplicate_count = int(pd.DataFrame({"series": series, "ds": dates}).duplicated().sum())
+
+    return date_ordered, duplicate_count
+
+
+def sort_by_date(
+        df: pd.DataFrame,
+        series_col: Union[str, None] = None,
+        ) -> pd.DataFrame:
+    """
+    Put the rows in date order (keeping rows with the same date in 
+    the order they were uploaded, and any blank dates at the end).
+
+    For long format data the rows are grouped by series first
+    (in the order each series first appears).
+    """
+
+    values = df["ds"].to_numpy(dtype="datetime64[ns]").view("i8")
+    sort_key = np.where(df["ds"].isna(), np.iinfo(np.int64).max, values)
+
+    if series_col is None:
+        order = np.argsort(sort_key, kind="stable")
+    else:
+        # lexsort is stable, and sorts by the last key first
+        order = np.lexsort((sort_key, pd.factorize(df[series_col])[0]))
+
+    return df.take(order).reset_index(drop=True)
+
+
+def combine_duplicate_dates(
+        df: pd.DataFrame,
+        value_cols: list[str],
+        how: str,
+        series_col: Union[str, None] = None,
+        ) -> pd.DataFrame:
+    """
+    Combine rows with the same date (in the same series) into one row. 
+
+    The value columns are added together or averaged (depending on 
+    'how') and every other column takes the first value for that date.
+    Expects the data to already be in date order.
+    """
+
+    keys = ["ds"] if series_col is None else [series_col, "ds"]
+    other_cols = [c for c in df.columns if c not in keys and c not in value_cols]
+
+    # Rows with a blank date are kept (rather than dropped by groupby)
+    # so they still get the blank date error from check_for_data_blocks
+    grouped = df.groupby(keys, sort=False, dropna=False)
+
+    if how == "sum":
+        # min_count keeps blank (future) rows blank rather than 0
+        combined_values = grouped[value_cols].sum(min_count=1)
+    elif how == "mean":
+        combined_values = grouped[value_cols].mean()
+    else:
+        raise ValueError(f"Unknown way to combine duplicate dates: {how}")
+
+    combined = pd.concat(
+        [grouped[other_cols].first(), combined_values], 
+        axis=1).reset_index()
+
+    return combined[df.columns]
+
+
+def check_duplicate_dates(
+        df: pd.DataFrame,
+        value_cols: list[str],
+        duplicate_dates: Union[str, None],
+        series_col: Union[str, None] = None,
+        ) -> Tuple[pd.DataFrame, int]:
+    """
+    Deal with any dates which appear more than once (which
+    will break Prophet), either by combining them or by raising 
+    an error so the user can fix their data.
+
+    Expects the data to already be in date order.
+
+    Returns:
+        Tuple[pd.DataFrame, int]: the data, number of rows that were combined
+    """
+
+    series = None if series_col is None else df[series_col]
+    _, duplicate_count = find_date_issues(df["ds"], series = series)
+
+    if duplicate_count == 0:
+        return df, 0
+
+    if duplicate_dates is None:
+        keys = ["ds"] if series_col is None else [series_col, "ds"]
+        examples = df.loc[df.duplicated(subset=keys), "ds"].drop_duplicates().head(10).dt.strftime("%Y-%m-%d").tolist()
+        raise ValueError(f"""
+
+Some of the dates in your data appear more than once ({duplicate_count} extra rows). Here are 
+{len(examples)} examples of dates which are repeated: {examples}.
+
+Prophet needs one row per date, so please either fix your data, or choose how repeated dates should
+be combined in the "Select columns" section, then refresh this page and try again.
+
+""")
+
+    df = combine_duplicate_dates(
+        df = df, 
+        value_cols = value_cols, 
+        how = duplicate_dates,
+        series_col = series_col)
+
+    return df, duplicate_count
+
+
+def columns_to_numbers(
+        df: pd.DataFrame,
+        column_names: dict[str, str],
+        ) -> None:
+    """
+    Convert Y and regressor cols to numbers (in place) to avoid errors.
+
+    All of the columns are handled together - anything that's already
+    a number is left alone, and any text is cleaned up in one go, so
+    we can cope with things like "1,234", "£12.50", "(300)" and "15%"
+    (which becomes 15, i.e. percentage points). Blank cells become NaN.
+
+    Args:
+        df (pd.DataFrame): the dataframe to convert
+        column_names (dict[str, str]): the columns to convert, and 
+            the names to use for them in any error message
+    """
+
+    columns = list(column_names)
+
+    # Columns pandas has already read as numbers just need to be floats
+    for _col in columns:
+        if pd.api.types.is_numeric_dtype(df[_col]):
+            df[_col] = df[_col].astype(float)
+
+    text_cols = [c for c in columns if not pd.api.types.is_float_dtype(df[c])]
+    if len(text_cols) == 0:
+        return
+
+    # Stack all the text columns into one long series so we
+    # only have to clean it up once
+    rows = len(df)
+    raw = pd.Series(df[text_cols].to_numpy(dtype=object).ravel(order="F"))
+
+    converted = pd.to_numeric(raw, errors="coerce")
+
+    # Only the cells which didn't convert straight away need cleaning
+    needs_cleaning = converted.isna() & raw.notna()
+    if needs_cleaning.any():
+        text = raw[needs_cleaning].astype(str).str.strip()
+
+        # Brackets are used for negative numbers in some exports
+        negative = text.str.startswith("(") & text.str.endswith(")")
+
+        cleaned = text.str.replace(r"[,£$€¥%()\s]", "", regex=True)
+        cleaned = cleaned.where(~negative, "-" + cleaned)
+
+        converted[needs_cleaning] = pd.to_numeric(cleaned, errors="coerce")
+
+        blank = text == ""
+        failed = converted[needs_cleaning].isna() & ~blank
+    
+        if failed.any():
+            failed_positions = failed[failed].index.to_numpy()
+            examples = [
+                f"- row {df.index[position % rows]} of '{column_names[text_cols[position // rows]]}': '{raw[position]}'"
+                for position in failed_positions[:10]
+                ]
+            failed_names = list(dict.fromkeys(
+                column_names[text_cols[position // rows]] for position in failed_positions
+                ))
+            
+            newline = "\n"
+            raise ValueError(f"""
+Error converting the data in your column(s) {failed_names} to numbers. 
+
+We couldn't read {len(failed_positions)} cells as numbers, for example:
+{newline.join(examples)}
+
+Please check those columns and make sure there's only numbers (or blank cells) in them.""")
+
+    values = converted.to_numpy(dtype=float)
+    for i, _col in enumerate(text_cols):
+        df[_col] = values[i * rows:(i + 1) * rows]
+
+
+def regressor_future_rows_error(
+        regressor_cols: list[str],
+        target_col: str,
+        series_message: str = "",
+        ) -> ValueError:
+
+    return ValueError(f"""
+
+You have listed regressor columns ({regressor_cols}).
+
+But the column you want to forecast ({target_col}) has an entry for every date.
+
+If you are going to use regressor columns you have to create a row for every date you
+want to forecast. The date and regressor columns have to be filled for those rows
+and the target column ({target_col}) has to be blank.
+
+That's because regressors are used to influence the forecast, but if they stop on the
+same date that the target column does, they won't do anything!
+
+{series_message}Please reload and either skip using the regressor columns, or add in the extra rows to your data.
+
+""")
+
+
+def _add_future_rows(
+        df: pd.DataFrame,
+        full_series: pd.DataFrame,
+        series_col: str,
+        data_frequency: str,
+        ) -> pd.DataFrame:
+    # Add generated future dates to the end of every series which 
+    # doesn't have any empty rows. Series which finish on the same 
+    # date get the same future dates, so we only create each set once.
+
+    last_dates = df["raw_date"].iloc[full_series["end"].to_numpy() - 1]
+    periods = dh.forecast_periods(data_frequency)
+
+    future_blocks = []
+    for last_date, series_ids in full_series.index.groupby(last_dates.to_numpy()).items():
+        new_dates = dh.future_dates(
+            last_date = pd.Timestamp(last_date),
+            freq = data_frequency,
+            periods = periods)
+
+        future_blocks.append(pd.DataFrame({
+            series_col: np.repeat(np.asarray(series_ids), len(new_dates)),
+            "ds": np.tile(new_dates, len(series_ids)),
+            "raw_date": np.tile(new_dates, len(series_ids)),
+            "y": np.nan,
+        }))
+
+    df = pd.concat([df] + future_blocks, ignore_index=True)
+
+    # Put the future rows after their series (the order of
+    # the series and rows within each series doesn't change)
+    codes = pd.factorize(df[series_col])[0]
+    order = np.argsort(codes, kind="stable")
+
+    return df.take(order).reset_index(drop=True)
+
+
+def series_split(
+        df: pd.DataFrame,
+        series_bounds: pd.DataFrame,
+        series_id,
+        ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Get the rows for one series from long format data (from 
+    check_and_convert_long_data).
+
+    Like split_at_boundary these are positional slices, so they're
+    VIEWS of df rather than copies.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: 
+            current (historic) rows, future rows, current plus future rows
+    """
+
+    start, forecast_start, end = series_bounds.loc[series_id, ["start", "forecast_start", "end"]]
+
+    current_plus_future = df.iloc[start:end]
+    current, future = split_at_boundary(
+        df = current_plus_future, 
+        forecast_start = forecast_start - start)
+
+    return current, future, current_plus_future
+
+
+def compact_dtypes(
+        df: pd.DataFrame,
+        series_col: Union[str, None] = None,
+        ) -> Tuple[pd.DataFrame, int]:
+    """
+    Store float64 columns as float32, which halves their memory, and
+    for long format data the series column as a category (so each 
+    series name is only stored once, rather than once per row).
+
+    Returns:
+        Tuple[pd.DataFrame, int]: the compacted data, the number of bytes saved
+    """
+
+    new_dtypes = {c: "float32" for c in df.select_dtypes(include="float64").columns}
+
+    if series_col is not None and not isinstance(df[series_col].dtype, pd.CategoricalDtype):
+        new_dtypes[series_col] = "category"
+
+    if len(new_dtypes) == 0:
+        return df, 0
+
+    # deep, so the text in the series column is counted
+    bytes_before = df.memory_usage(deep=True).sum()
+    df = df.astype(new_dtypes)
+    bytes_saved = int(bytes_before - df.memory_usage(deep=True).sum())
+
+    return df, bytes_saved
+
+
+def split_at_boundary(
+        df: pd.DataFrame,
+        forecast_start: int,
+        ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split checked data into the historic rows and the rows to forecast.
+
+    The data is always historic rows first and then future rows, so 
+    these are just positional slices - they are VIEWS of df which share
+    its memory rather than copies. Don't change them in place (take a
+    .copy() first if you need to) or you'll change df as well.
+
+    Args:
+        df (pd.DataFrame): the checked data, including the future rows
+        forecast_start (int): position of the first future row
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: current (historic) rows, future rows
+    """
+
+    return df.iloc[:forecast_start], df.iloc[forecast_start:]
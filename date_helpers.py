@@ -0,0 +1,256 @@
+import pandas as pd
+import numpy as np
+from typing import Optional, Tuple
+
+
+# Date formats we'll try, in order of preference. Where a date could
+# be read more than one way (i.e. 10/12/2007) we go with the first
+# format that works, so day-first comes before month-first.
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%m/%d/%Y %H:%M",
+    "%d-%m-%Y",
+    "%m-%d-%Y",
+    "%d.%m.%Y",
+    "%d/%m/%y",
+    "%m/%d/%y",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%b %d, %Y",
+    "%B %d, %Y",
+    "ISO8601",
+]
+
+# Most unique dates we'll look at when working out the format
+SAMPLE_SIZE = 500
+
+
+def _parse_with_format(
+        values: pd.Index,
+        date_format: str
+        ) -> pd.DatetimeIndex:
+
+    try:
+        parsed = pd.DatetimeIndex(pd.to_datetime(values, format=date_format, errors="coerce"))
+    except (ValueError, TypeError):
+        # i.e. a mix of timezones, which we can't sensibly read
+        return pd.DatetimeIndex([pd.NaT] * len(values))
+
+    # Prophet can't handle timezones so keep the local time
+    if parsed.tz is not None:
+        parsed = parsed.tz_localize(None)
+
+    return parsed
+
+
+def _sample(values: pd.Index) -> pd.Index:
+    # Spread the sample across the whole range so we see
+    # both the start and the end of the data
+    if len(values) <= SAMPLE_SIZE:
+        return values
+    positions = np.linspace(0, len(values) - 1, SAMPLE_SIZE).astype(int)
+    return values[positions]
+
+
+def detect_date_formats(values: pd.Index) -> list[str]:
+    """
+    Work out which formats could be used for the dates, based on
+    a sample of them.
+
+    Returns the formats which can read the most of the sample, in
+    order of preference (so there's more than one if the sample
+    is ambiguous, and the list is empty if nothing fits at all).
+    """
+
+    sample = _sample(values)
+
+    parsed_counts = {
+        date_format: int(_parse_with_format(sample, date_format).notna().sum())
+        for date_format in DATE_FORMATS
+        }
+
+    best_count = max(parsed_counts.values())
+    if best_count == 0:
+        return []
+
+    return [
+        date_format
+        for date_format, count in parsed_counts.items()
+        if count == best_count
+        ]
+
+
+def parse_dates(
+        values: pd.Series,
+        date_format: Optional[str] = None,
+        ) -> Tuple[pd.Series, Optional[int], Optional[str]]:
+    """
+    Convert a column of dates to datetimes.
+
+    Only the unique values get parsed (and then mapped back onto
+    every row) which saves a lot of work for long files where the
+    same dates come up again and again.
+
+    Args:
+        values (pd.Series): the raw dates
+        date_format (str): the format to use, if not given we'll work it out from the data
+
+    Returns:
+        Tuple[pd.Series, Optional[int], Optional[str]]:
+            the converted dates,
+            the position of the first row we couldn't convert (None if they were all fine),
+            the format we used
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, None, date_format
+
+    # codes are -1 for blank cells
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Index(uniques).astype(str).str.strip()
+
+    if date_format is not None:
+        candidate_formats = [date_format]
+    else:
+        candidate_formats = detect_date_formats(uniques)
+
+    parsed_uniques = pd.DatetimeIndex([pd.NaT] * len(uniques))
+    failed_uniques = np.asarray(uniques != "")
+    chosen_format = candidate_formats[0] if candidate_formats else None
+
+    # If the sample was ambiguous, go with whichever format reads
+    # the most dates (preferring the earlier formats on a tie)
+    for candidate_format in candidate_formats:
+        candidate_parsed = _parse_with_format(uniques, candidate_format)
+        candidate_failed = candidate_parsed.isna() & (uniques != "")
+
+        if candidate_failed.sum() < failed_uniques.sum():
+            parsed_uniques = candidate_parsed
+            failed_uniques = candidate_failed
+            chosen_format = candidate_format
+
+        if not candidate_failed.any():
+            break
+
+    # Add a blank on the end so -1 codes (blank cells) map to NaT
+    parsed_lookup = np.append(parsed_uniques.to_numpy(), np.datetime64("NaT"))
+    failed_lookup = np.append(failed_uniques, False)
+
+    parsed = pd.Series(parsed_lookup[codes], index=values.index, name=values.name)
+
+    failed_rows = failed_lookup[codes]
+    first_failed_row: Optional[int] = None
+    if failed_rows.any():
+        first_failed_row = int(np.argmax(failed_rows))
+
+    return parsed, first_failed_row, chosen_format
+
+
+# How far ahead we forecast (when the user hasn't left blank rows)
+# for each frequency, roughly 3 years except for hourly data 
+# where that would be far too many rows
+FORECAST_PERIODS = {
+    "H": 24 * 90,
+    "D": 1096,
+    "W": 157,
+    "MS": 36,
+}
+
+
+def infer_frequency(
+        dates: pd.Series,
+        series: Optional[pd.Series] = None,
+        ) -> str:
+    """
+    Work out how often the data is recorded, based on the typical
+    gap between dates.
+
+    If the data has more than one series (i.e. long format data) 
+    pass the series column too, so we only look at the gaps between
+    dates in the same series.
+
+    Returns:
+        str: "H" (hourly), "D" (daily), "W-XXX" (weekly, on the same 
+            day of the week as the data), or "MS" (monthly)
+    """
+
+    has_date = dates.notna().to_numpy()
+    values = dates.to_numpy(dtype="datetime64[ns]").view("i8")[has_date]
+
+    if series is None:
+        values = np.sort(values)
+        gaps = np.diff(values)
+    else:
+        codes = pd.factorize(series)[0][has_date]
+        order = np.lexsort((values, codes))
+        values = values[order]
+        gaps = np.diff(values)[np.diff(codes[order]) == 0]
+
+    gaps = gaps[gaps > 0]
+
+    if len(gaps) == 0:
+        # Not enough data to tell, so assume daily
+        return "D"
+
+    typical_gap = pd.Timedelta(int(np.median(gaps)))
+
+    if typical_gap <= pd.Timedelta(minutes=90):
+        return "H"
+    if typical_gap <= pd.Timedelta(hours=36):
+        return "D"
+    if typical_gap <= pd.Timedelta(days=10):
+        last_date = pd.Timestamp(values[-1])
+        return f"W-{last_date.day_name()[:3].upper()}"
+    if typical_gap <= pd.Timedelta(days=45):
+        return "MS"
+    
+    # Anything less frequent than monthly we treat as daily 
+    # (which is what we always used to do)
+    return "D"
+
+
+def forecast_periods(freq: str) -> int:
+    # Weekly frequencies include the day of the week
+    return FORECAST_PERIODS[freq.split("-")[0]]
+
+
+def future_dates(
+        last_date: pd.Timestamp,
+        freq: str,
+        periods: int,
+        ) -> pd.DatetimeIndex:
+    """
+    Create the dates after last_date, at the same frequency as the data.
+
+    Monthly dates keep the same day of the month as last_date (or 
+    the end of the month, for shorter months).
+    """
+
+    if freq != "MS":
+        return pd.date_range(
+            start=last_date, 
+            periods=periods + 1, 
+            freq=freq)[1:]
+
+    month_starts = pd.date_range(
+        start=last_date.to_period("M").to_timestamp() + pd.offsets.MonthBegin(1), 
+        periods=periods, 
+        freq="MS")
+
+    if last_date.is_month_end:
+        days = month_starts.days_in_month
+    else:
+        days = np.minimum(last_date.day, month_starts.days_in_month)
+
+    time_of_day = last_date - last_date.normalize()
+
+    return month_starts + pd.to_timedelta(days - 1, unit="D") + time_of_day
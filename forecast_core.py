@@ -0,0 +1,1258 @@
+"""
+The forecasting workflow (checking data, fitting, predicting and
+adjusting the trend) without any of the Streamlit app.
+
+Everything here takes its settings as arguments (usually one of the
+config classes below) and returns its results, rather than reading
+or writing st.session_state, so it can be used from a script, a 
+batch job or a worker process as well as from the app.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import prophet # type: ignore
+from prophet import Prophet # type: ignore
+from prophet.serialize import model_to_json, model_from_json # type: ignore
+
+import cache_helpers as cah
+import check_helpers as chk
+import date_helpers as dh
+import handle_holiday_list as hh
+
+
+@dataclass
+class DataConfig:
+    """
+    Which columns of the uploaded data to use, and how to tidy it up.
+    """
+
+    date_col: str
+    target_col: str
+    regressor_cols: list[str] = field(default_factory=list)
+
+    # For long format data, the column saying which series each row is in
+    series_col: Optional[str] = None
+
+    # How to combine repeated dates ("sum" or "mean"), None raises an error
+    duplicate_dates: Optional[str] = None
+
+    # Store float columns as float32
+    compact: bool = False
+
+    # Put data which isn't in date order into order, if False it's an error
+    reorder: bool = True
+
+
+@dataclass
+class ModelConfig:
+    """
+    Everything (other than the data) which changes the fitted model.
+    """
+
+    regressor_cols: list[str] = field(default_factory=list)
+    # Prophet codes for each country (i.e. "GB") whose holidays we include
+    holiday_countries: list[str] = field(default_factory=list)
+    use_log_scale: bool = False
+    data_frequency: str = "D"
+
+
+@dataclass
+class CheckedData:
+    """
+    Data for one series which is ready to forecast.
+
+    current and future are views of current_plus_future (see 
+    check_helpers.split_at_boundary).
+    """
+
+    current: pd.DataFrame
+    future: pd.DataFrame
+    current_plus_future: pd.DataFrame
+    data_changes: dict
+    data_frequency: str
+    bytes_saved: int = 0
+
+
+@dataclass
+class CheckedLongData:
+    """
+    Long format data with every series ready to forecast, grouped by
+    series, with the positions of each series in series_bounds.
+    """
+
+    data: pd.DataFrame
+    series_bounds: pd.DataFrame
+    data_changes: dict
+    data_frequency: str
+    bytes_saved: int = 0
+
+    def series(self, series_id) -> CheckedData:
+        # Views of the long data for one series, not copies
+        current, future, current_plus_future = chk.series_split(
+            df = self.data, 
+            series_bounds = self.series_bounds, 
+            series_id = series_id)
+
+        return CheckedData(
+            current = current,
+            future = future,
+            current_plus_future = current_plus_future,
+            data_changes = self.data_changes,
+            data_frequency = self.data_frequency,
+            )
+
+
+def order_data(
+        df: pd.DataFrame,
+        series_col: Optional[str] = None,
+        reorder: bool = True,
+        ) -> Tuple[pd.DataFrame, bool]:
+    """
+    Put data (with a converted ds column) into date order if it isn't already.
+
+    Returns:
+        Tuple[pd.DataFrame, bool]: the data, whether we had to reorder it
+    """
+
+    series = None if series_col is None else df[series_col]
+    date_ordered, _ = chk.find_date_issues(df["ds"], series = series)
+
+    if date_ordered:
+        return df, False
+
+    if not reorder:
+        raise ValueError("""
+
+The data you uploaded isn't in date order. Please sort it by date (and by series, if
+you have more than one) and try again.
+
+""")
+
+    return chk.sort_by_date(df, series_col = series_col), True
+
+
+def check_data(
+        df: pd.DataFrame,
+        config: DataConfig,
+        ) -> CheckedData:
+    """
+    Convert and check uploaded data (with one series) so it's ready 
+    to forecast, raising a ValueError if there's something the user
+    needs to fix.
+    """
+
+    df = chk.date_col_conversion(df = df, date_col = config.date_col)
+    df, reordered = order_data(df = df, reorder = config.reorder)
+
+    return finish_checks(df = df, config = config, reordered = reordered)
+
+
+def check_long_data(
+        df: pd.DataFrame,
+        config: DataConfig,
+        ) -> CheckedLongData:
+    """
+    The same as check_data, but for long format data (with 
+    config.series_col) where every series is checked at once.
+    """
+
+    df = chk.date_col_conversion(df = df, date_col = config.date_col)
+    chk.check_series_ids(df[config.series_col], series_column = config.series_col)
+    df, reordered = order_data(
+        df = df, 
+        series_col = config.series_col, 
+        reorder = config.reorder)
+
+    return finish_long_checks(df = df, config = config, reordered = reordered)
+
+
+def _tidy_values(
+        df: pd.DataFrame,
+        config: DataConfig,
+        ) -> Tuple[pd.DataFrame, int]:
+    # The steps which are the same for one series or many, once
+    # the data is in order. Returns the data and the number of 
+    # rows combined because they had repeated dates
+
+    # Create expected "y" column
+    if config.target_col != "y":
+        df = df.rename(columns={config.target_col:"y"})
+
+    # Convert the columns to numbers to make sure we don't hit confusing errors later
+    chk.columns_to_numbers(
+        df = df, 
+        column_names = {"y": config.target_col, **{_col: _col for _col in config.regressor_cols}})
+
+    # Combine (or complain about) any repeated dates
+    return chk.check_duplicate_dates(
+        df = df,
+        value_cols = ["y"] + config.regressor_cols,
+        duplicate_dates = config.duplicate_dates,
+        series_col = config.series_col
+    )
+
+
+def finish_checks(
+        df: pd.DataFrame,
+        config: DataConfig,
+        reordered: bool = False,
+        ) -> CheckedData:
+    """
+    The rest of check_data, for data which already has its dates
+    converted and is in date order.
+    """
+
+    df, rows_combined = _tidy_values(df = df, config = config)
+
+    # Keep track of what we changed so we can tell the user
+    data_changes = {
+        "reordered": reordered,
+        "rows_combined": rows_combined,
+        "duplicate_dates": config.duplicate_dates,
+    }
+
+    # Work out how often the data is recorded (daily, weekly etc.)
+    data_frequency = dh.infer_frequency(df["ds"])
+
+    # Check that there are some rows in the uploaded data to
+    # make room for a forecast
+    forecast_start = chk.check_for_data_blocks(
+        df = df,
+        target_column = "y",
+        date_column = "raw_date",
+        regressor_column_list = config.regressor_cols
+        )
+    
+    if forecast_start < len(df):
+        current_plus_future = df
+    
+    else:
+        # If we have no empty rows we can guess how far in the future
+        # we want to forecast BUT that will mean that our regressor
+        # columns stop (which is no good) so if the user is trying
+        # to use regressors they have to leave empty rows
+        if len(config.regressor_cols) >0:
+            raise chk.regressor_future_rows_error(
+                regressor_cols = config.regressor_cols, 
+                target_col = config.target_col)
+        
+        # If we're not using regressor columns, we can just generate the dates
+        # (at the same frequency as the data)
+        new_dates = dh.future_dates(
+            last_date = df["raw_date"].iloc[-1],
+            freq = data_frequency,
+            periods = dh.forecast_periods(data_frequency))
+        
+        future_rows = pd.DataFrame({
+            "ds": new_dates,
+            "raw_date": new_dates,
+            "y": np.nan
+        })
+
+        current_plus_future = pd.concat([df, future_rows], ignore_index=True)
+
+    bytes_saved = 0
+    if config.compact:
+        current_plus_future, bytes_saved = chk.compact_dtypes(current_plus_future)
+
+    # Current and future are views of current_plus_future rather than copies
+    current, future = chk.split_at_boundary(
+        df = current_plus_future, 
+        forecast_start = forecast_start)
+
+    return CheckedData(
+        current = current,
+        future = future,
+        current_plus_future = current_plus_future,
+        data_changes = data_changes,
+        data_frequency = data_frequency,
+        bytes_saved = bytes_saved,
+        )
+
+
+def finish_long_checks(
+        df: pd.DataFrame,
+        config: DataConfig,
+        reordered: bool = False,
+        ) -> CheckedLongData:
+    """
+    The rest of check_long_data, for data which already has its dates
+    converted and is in order.
+    """
+
+    series_col = config.series_col
+    if series_col is None:
+        raise ValueError("Long format data needs a series column")
+
+    df, rows_combined = _tidy_values(df = df, config = config)
+
+    data_changes = {
+        "reordered": reordered,
+        "rows_combined": rows_combined,
+        "duplicate_dates": config.duplicate_dates,
+    }
+
+    # All the series share one frequency
+    data_frequency = dh.infer_frequency(df["ds"], series = df[series_col])
+
+    series_bounds = chk.check_for_data_blocks_by_series(
+        df = df,
+        target_column = "y",
+        date_column = "raw_date",
+        regressor_column_list = config.regressor_cols,
+        series_column = series_col
+        )
+
+    full_series = series_bounds[series_bounds["forecast_start"] == series_bounds["end"]]
+
+    if len(full_series) > 0:
+
+        if len(config.regressor_cols) > 0:
+            raise chk.regressor_future_rows_error(
+                regressor_cols = config.regressor_cols, 
+                target_col = config.target_col,
+                series_message = f"""This is the case for {len(full_series)} of your series, i.e. {full_series.index[:10].tolist()}.
+
+""")
+
+        df = chk._add_future_rows(
+            df = df, 
+            full_series = full_series, 
+            series_col = series_col, 
+            data_frequency = data_frequency)
+
+        series_bounds = chk.check_for_data_blocks_by_series(
+            df = df,
+            target_column = "y",
+            date_column = "raw_date",
+            regressor_column_list = config.regressor_cols,
+            series_column = series_col
+            )
+
+    bytes_saved = 0
+    if config.compact:
+        df, bytes_saved = chk.compact_dtypes(df, series_col = series_col)
+
+    return CheckedLongData(
+        data = df,
+        series_bounds = series_bounds,
+        data_changes = data_changes,
+        data_frequency = data_frequency,
+        bytes_saved = bytes_saved,
+        )
+
+
+def model_dtypes(
+        df: pd.DataFrame
+        ) -> pd.DataFrame:
+    """
+    Convert any compact (float32) columns back to float64 before the
+    data goes to Prophet, so the model sees the same numbers whether
+    or not we're storing data compactly.
+    """
+
+    float32_cols = df.select_dtypes(include="float32").columns
+
+    if len(float32_cols) == 0:
+        return df
+
+    return df.astype({c: "float64" for c in float32_cols})
+
+
+def seasonality_settings(
+        data_frequency: str
+        ) -> dict:
+    """
+    Which seasonal patterns make sense for data recorded at this 
+    frequency, i.e. there's no point looking for a weekly pattern
+    in weekly data, or a daily pattern in anything but hourly data.
+
+    Where they do make sense we leave it to Prophet ("auto") to 
+    decide if there's enough data to use them.
+    """
+
+    freq = data_frequency.split("-")[0]
+
+    return {
+        "daily_seasonality": "auto" if freq == "H" else False,
+        "weekly_seasonality": "auto" if freq in ["H", "D"] else False,
+        "monthly_seasonality": freq in ["H", "D"],
+    }
+
+
+# Set to "no" to always refit models rather than using the cache
+MODEL_CACHE = os.getenv("TRENDS_ADJUST_MODEL_CACHE", "yes") == "yes"
+
+# Change this if the models would come out differently
+# for the same data and settings
+MODEL_CACHE_VERSION = 1
+
+
+# Set to "no" to always fit models from scratch, rather than starting
+# from an earlier model fitted to the first part of the same data
+WARM_START = os.getenv("TRENDS_ADJUST_WARM_START", "yes") == "yes"
+
+# How many earlier fits we remember for each set of model settings
+MODEL_INDEX_SIZE = 20
+
+
+def _config_key(
+        config: ModelConfig,
+        ) -> str:
+    # Everything other than the data which changes the model
+    return cah.hash_key(
+        MODEL_CACHE_VERSION,
+        prophet.__version__,
+        list(config.regressor_cols),
+        sorted(config.holiday_countries),
+        config.use_log_scale,
+        seasonality_settings(config.data_frequency),
+    )
+
+
+def _row_hashes(
+        df: pd.DataFrame,
+        config: ModelConfig,
+        ) -> np.ndarray:
+    # One hash per training row, so we can hash the first n rows 
+    # of the data without going back to the data itself
+    training_cols = ["ds", "y"] + list(config.regressor_cols)
+    return pd.util.hash_pandas_object(
+        model_dtypes(df[training_cols]), 
+        index=False).to_numpy()
+
+
+def _data_hash(
+        row_hashes: np.ndarray
+        ) -> str:
+    return cah.hash_key(row_hashes.tobytes())
+
+
+def model_cache_key(
+        df: pd.DataFrame,
+        config: ModelConfig,
+        ) -> str:
+    """
+    Key for the model cache, based on the data the model is trained
+    on and every setting that changes the model.
+    """
+
+    return cah.hash_key(
+        _config_key(config), 
+        _data_hash(_row_hashes(df, config)))
+
+
+def load_cached_model(
+        key: str
+        ) -> Optional[Prophet]:
+
+    model_json = cah.load_bytes(namespace = "models", key = key, suffix = ".json")
+
+    if model_json is None:
+        return None
+
+    # The cache key identifies the model, so it's the fingerprint too
+    return set_model_fingerprint(model_from_json(model_json.decode("utf-8")), key)
+
+
+def save_cached_model(
+        key: str,
+        m: Prophet,
+        ) -> None:
+
+    cah.save_bytes(
+        data = model_to_json(m).encode("utf-8"), 
+        namespace = "models", 
+        key = key, 
+        suffix = ".json")
+
+
+def build_model(
+        config: ModelConfig,
+        dates: Optional[pd.Series] = None,
+        ) -> Prophet:
+    """
+    Create an (unfitted) Prophet model with our settings.
+
+    The holidays for config.holiday_countries cover the years of
+    dates (the data the model will be fitted to) and the years after.
+    """
+    
+    seasonality = seasonality_settings(config.data_frequency)
+
+    # Add in country holidays if selected, from the tables we've
+    # already built rather than having Prophet build them each fit
+    holidays = None
+    if config.holiday_countries:
+        if dates is None:
+            raise ValueError("We need the dates the model will be fitted to, to include holidays")
+        holidays = hh.holidays_frame(countries = config.holiday_countries, dates = dates)
+
+    m = Prophet(
+        seasonality_mode="multiplicative",
+        daily_seasonality=seasonality["daily_seasonality"],
+        weekly_seasonality=seasonality["weekly_seasonality"],
+        holidays=holidays,
+        )
+
+    # Add monthly seasonality
+    if seasonality["monthly_seasonality"]:
+        m.add_seasonality(name='monthly', period=30.5, fourier_order=5)
+
+    # If the list is empty it shouldn't loop
+    for c in config.regressor_cols:
+        m.add_regressor(c)
+
+    return m
+
+
+def _load_model_index(
+        config_key: str
+        ) -> list[dict]:
+    index_json = cah.load_bytes(namespace = "model_index", key = config_key, suffix = ".json")
+
+    if index_json is None:
+        return []
+
+    return json.loads(index_json)
+
+
+def _remember_fit(
+        config_key: str,
+        rows: int,
+        data_hash: str,
+        model_key: str,
+        ) -> None:
+    # Keep a short list of the data each model (with these settings) was
+    # fitted to, newest first, so a later upload with more rows can find it
+    index = [
+        entry for entry in _load_model_index(config_key) 
+        if entry["model_key"] != model_key
+        ]
+    index.insert(0, {"rows": rows, "data_hash": data_hash, "model_key": model_key})
+
+    cah.save_bytes(
+        data = json.dumps(index[:MODEL_INDEX_SIZE]).encode("utf-8"),
+        namespace = "model_index", 
+        key = config_key, 
+        suffix = ".json")
+
+
+def find_previous_fit(
+        row_hashes: np.ndarray,
+        config_key: str,
+        ) -> Optional[Prophet]:
+    """
+    Find the cached model (with the same settings) which was fitted 
+    to the longest run of rows at the start of this data, i.e. last 
+    month's model when this month's upload is the same data plus some
+    new days.
+
+    Returns None if there isn't one.
+    """
+
+    candidates = sorted(
+        _load_model_index(config_key), 
+        key = lambda entry: entry["rows"], 
+        reverse = True)
+
+    for entry in candidates:
+        rows = entry["rows"]
+        if rows >= len(row_hashes):
+            continue
+
+        if _data_hash(row_hashes[:rows]) != entry["data_hash"]:
+            continue
+
+        # The model might have been evicted from the cache
+        previous = load_cached_model(entry["model_key"])
+        if previous is not None:
+            return previous
+
+    return None
+
+
+def warm_start_params(
+        m: Prophet
+        ) -> dict:
+    """
+    A fitted model's parameters, in the form Prophet takes as a 
+    starting point for fitting a new model. 
+
+    Prophet checks these fit the new model, and falls back to its 
+    usual starting point for any that don't (i.e. if there's more 
+    seasonality now there's more data).
+    """
+
+    return {
+        "k": m.params["k"][0][0],
+        "m": m.params["m"][0][0],
+        "sigma_obs": m.params["sigma_obs"][0][0],
+        "delta": m.params["delta"][0],
+        "beta": m.params["beta"][0],
+    }
+
+
+def load_fitted_model(
+        df: pd.DataFrame,
+        config: ModelConfig,
+        ) -> Optional[Prophet]:
+    """
+    The model fit_model would give us, if it's already in the 
+    cache (without fitting anything). Returns None if it isn't.
+    """
+
+    return load_cached_model(model_cache_key(df = df, config = config))
+
+
+def fit_model(
+        df: pd.DataFrame,
+        config: ModelConfig,
+        use_cache: bool = MODEL_CACHE,
+        warm_start: bool = WARM_START,
+        ) -> Prophet:
+    """
+    Fit a model to the historic data, or load it from the cache
+    if we've fitted the same model before.
+
+    If we've fitted a model to the first part of the same data 
+    (i.e. the same upload, but with fewer days) we start fitting 
+    from that model's parameters, which is quicker than starting 
+    from scratch and ends up at the same answer.
+    """
+
+    previous = None
+
+    if use_cache:
+        config_key = _config_key(config)
+        row_hashes = _row_hashes(df, config)
+        data_hash = _data_hash(row_hashes)
+        cache_key = cah.hash_key(config_key, data_hash)
+
+        cached_model = load_cached_model(cache_key)
+        if cached_model is not None:
+            return cached_model
+
+        if warm_start:
+            previous = find_previous_fit(row_hashes = row_hashes, config_key = config_key)
+
+    m = build_model(config, dates = df["ds"])
+
+    # Log transform data to avoid predictions that go below 0
+    df_for_fit = model_dtypes(df.copy(deep=True))
+    if config.use_log_scale:
+        df_for_fit["y"] = np.log(df_for_fit["y"])
+
+    if previous is not None:
+        m.fit(df_for_fit, init = warm_start_params(previous))
+    else:
+        m.fit(df_for_fit)
+
+    if use_cache:
+        set_model_fingerprint(m, cache_key)
+        save_cached_model(key = cache_key, m = m)
+        _remember_fit(
+            config_key = config_key, 
+            rows = len(row_hashes), 
+            data_hash = data_hash, 
+            model_key = cache_key)
+
+    return m
+
+
+# How many simulations Prophet runs to work out the uncertainty 
+# intervals (yhat_lower and yhat_upper), which is most of the time
+# predict takes. "none" just gives the point forecast
+INTERVAL_MODES = {
+    "none": 0,
+    "reduced": 100,
+    "full": 1000,
+}
+
+# Prophet only gives these a lower and upper bound when it simulates
+# the uncertainty, the other components are the same with or without
+SIMULATED_COLUMNS = ["yhat", "trend", "multiplicative_terms"]
+
+# Everything the trend adjustment needs from a prediction, which is
+# all a lean prediction has (rather than a column, and bounds, for 
+# every seasonality and holiday)
+LEAN_COLUMNS = ["ds"] + [
+    f"{c}{bound}" 
+    for c in ["trend", "multiplicative_terms", "yhat"] 
+    for bound in ["", "_lower", "_upper"]
+    ]
+
+# Set TRENDS_ADJUST_LEAN_PREDICT=no to keep all of Prophet's columns
+LEAN_PREDICT = os.getenv("TRENDS_ADJUST_LEAN_PREDICT", "yes") == "yes"
+
+
+# Set TRENDS_ADJUST_PREDICTION_CACHE=no to always call Prophet's predict
+PREDICTION_CACHE = os.getenv("TRENDS_ADJUST_PREDICTION_CACHE", "yes") == "yes"
+
+# Change this if the format of the cached predictions changes
+PREDICTION_CACHE_VERSION = 2
+
+
+# Where a model's fingerprint is kept, so it's only worked out once
+_FINGERPRINT_ATTRIBUTE = "_trends_adjust_fingerprint"
+
+
+def set_model_fingerprint(
+        fitted_model: Prophet,
+        fingerprint: str,
+        ) -> Prophet:
+    # Keep the fingerprint with the model (i.e. its model cache key, 
+    # set when it's fitted or loaded) and return the model
+    setattr(fitted_model, _FINGERPRINT_ATTRIBUTE, fingerprint)
+    return fitted_model
+
+
+def model_fingerprint(
+        fitted_model: Prophet,
+        ) -> str:
+    """
+    A key for a fitted model, which is the same for a model loaded
+    from the cache as for the model that was saved.
+
+    Models from fit_model (with the cache) or the model cache already
+    have one, for anything else it's a hash of the whole model, which
+    is worked out the first time it's needed and then kept.
+    """
+
+    fingerprint = getattr(fitted_model, _FINGERPRINT_ATTRIBUTE, None)
+
+    if fingerprint is None:
+        fingerprint = cah.hash_key(model_to_json(fitted_model).encode("utf-8"))
+        set_model_fingerprint(fitted_model, fingerprint)
+
+    return fingerprint
+
+
+def prediction_cache_key(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        interval_mode: str,
+        lean: bool = LEAN_PREDICT,
+        ) -> str:
+    """
+    Key for the prediction cache, based on the fitted model, the
+    rows we're predicting and how the prediction is worked out.
+    """
+
+    future_data = model_dtypes(future_data)
+
+    return cah.hash_key(
+        PREDICTION_CACHE_VERSION,
+        model_fingerprint(fitted_model),
+        list(future_data.columns),
+        pd.util.hash_pandas_object(future_data, index=False).to_numpy().tobytes(),
+        interval_mode,
+        lean,
+    )
+
+
+def prediction_is_cached(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        interval_mode: str,
+        lean: bool = LEAN_PREDICT,
+        ) -> bool:
+    """
+    Whether predict would load this prediction from the cache.
+    """
+
+    key = prediction_cache_key(
+        fitted_model = fitted_model, 
+        future_data = future_data, 
+        interval_mode = interval_mode,
+        lean = lean)
+
+    return os.path.exists(cah.cache_path("predictions", key, ".parquet"))
+
+
+def _predict_lean(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        ) -> pd.DataFrame:
+    # The same sums as Prophet's predict (and its uncertainty simulation)
+    # for just LEAN_COLUMNS, working out the seasonal features once and 
+    # keeping everything as arrays until the end
+    m = fitted_model
+    df = m.setup_dataframe(model_dtypes(future_data).copy())
+
+    trend = np.asarray(m.predict_trend(df), dtype=float)
+
+    seasonal_features, _, component_cols, _ = m.make_all_seasonality_features(df)
+    X = seasonal_features.to_numpy()
+    s_m = component_cols["multiplicative_terms"].to_numpy()
+    s_a = component_cols["additive_terms"].to_numpy()
+
+    # One column per posterior sample (just the one unless fitted with mcmc)
+    beta = m.params["beta"]
+    multiplicative = X @ (beta * s_m).T
+    additive = X @ (beta * s_a).T * m.y_scale
+
+    multiplicative_terms = np.nanmean(multiplicative, axis=1)
+    yhat = trend * (1 + multiplicative_terms) + np.nanmean(additive, axis=1)
+
+    columns = {
+        "ds": df["ds"].to_numpy(),
+        "trend": trend,
+        "multiplicative_terms": multiplicative_terms,
+        "yhat": yhat,
+    }
+
+    if m.uncertainty_samples:
+        lower_p = 100 * (1.0 - m.interval_width) / 2
+        upper_p = 100 * (1.0 + m.interval_width) / 2
+
+        columns["multiplicative_terms_lower"] = m.percentile(multiplicative, lower_p, axis=1)
+        columns["multiplicative_terms_upper"] = m.percentile(multiplicative, upper_p, axis=1)
+
+        # Simulate the future trend (and noise) for each posterior sample
+        n_iterations = m.params["k"].shape[0]
+        samples_per_iteration = max(1, int(np.ceil(m.uncertainty_samples / n_iterations)))
+
+        simulated_trends, simulated_yhats = [], []
+        for i in range(n_iterations):
+            trends = m.sample_predictive_trend_vectorized(df, samples_per_iteration, i)
+            noise = np.random.normal(0, m.params["sigma_obs"][i], trends.shape) * m.y_scale
+
+            simulated_trends.append(trends)
+            simulated_yhats.append(trends * (1 + multiplicative[:, i]) + additive[:, i] + noise)
+
+        simulated = {
+            "trend": np.concatenate(simulated_trends),
+            "yhat": np.concatenate(simulated_yhats),
+        }
+        for c, values in simulated.items():
+            columns[f"{c}_lower"] = m.percentile(values, lower_p, axis=0)
+            columns[f"{c}_upper"] = m.percentile(values, upper_p, axis=0)
+
+    else:
+        for c in SIMULATED_COLUMNS:
+            columns[f"{c}_lower"] = columns[c]
+            columns[f"{c}_upper"] = columns[c]
+
+    return pd.DataFrame(columns)[LEAN_COLUMNS]
+
+
+def predict(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        interval_mode: str = "full",
+        use_cache: bool = PREDICTION_CACHE,
+        lean: bool = LEAN_PREDICT,
+        ) -> pd.DataFrame:
+    """
+    Prophet's broken down prediction, with the uncertainty intervals
+    worked out as accurately as interval_mode asks for.
+
+    With interval_mode "none" the lower and upper columns are still
+    there (so everything downstream works the same) but they're just
+    the point forecast.
+
+    If lean, only LEAN_COLUMNS are worked out (which is all the trend
+    adjustment needs), which is much quicker with lots of holidays.
+
+    If use_cache, predictions are kept on disk (separately from the 
+    model) so predicting the same rows with the same model again, 
+    i.e. in a new session, doesn't need Prophet.
+    """
+
+    if use_cache:
+        cache_key = prediction_cache_key(
+            fitted_model = fitted_model, 
+            future_data = future_data, 
+            interval_mode = interval_mode,
+            lean = lean)
+
+        cached = cah.load_frame(namespace = "predictions", key = cache_key)
+        if cached is not None:
+            return cached[0]
+
+    uncertainty_samples = INTERVAL_MODES[interval_mode]
+
+    # The model may be shared (i.e. in the session) so put it back how it was
+    default_samples = fitted_model.uncertainty_samples
+    fitted_model.uncertainty_samples = uncertainty_samples
+    try:
+        if lean:
+            forecast = _predict_lean(fitted_model, future_data)
+        else:
+            forecast = fitted_model.predict(model_dtypes(future_data))
+    finally:
+        fitted_model.uncertainty_samples = default_samples
+
+    if uncertainty_samples == 0:
+        for c in SIMULATED_COLUMNS:
+            forecast[f"{c}_lower"] = forecast[c]
+            forecast[f"{c}_upper"] = forecast[c]
+
+    if use_cache:
+        cah.save_frame(df = forecast, namespace = "predictions", key = cache_key)
+
+    return forecast
+
+
+def untransform_forecast(
+        df: pd.DataFrame,
+        columns_to_adjust: list[str],
+        use_log_scale: bool,
+        ) -> pd.DataFrame:
+    
+    # Log transform predicted data (reversing earlier transform)
+    # Clip values at 0 to avoid any negatives
+    if use_log_scale:
+        for c in columns_to_adjust:
+            df[c] = np.exp(df[c])
+            df[c] = df[c].clip(lower = 0)
+        
+    return df
+
+
+def forecast(
+        checked: CheckedData,
+        config: ModelConfig,
+        use_cache: bool = MODEL_CACHE,
+        interval_mode: str = "full",
+        ) -> pd.DataFrame:
+    """
+    Fit a model to the historic rows of checked data and predict 
+    the future rows (use_cache covers both the model and the prediction).
+    """
+
+    m = fit_model(df = checked.current, config = config, use_cache = use_cache)
+
+    return predict(
+        fitted_model = m, 
+        future_data = checked.future, 
+        interval_mode = interval_mode,
+        use_cache = use_cache)
+
+
+# The trend multiplier, either one value for the whole forecast
+# or one for each forecast row (see TrendSchedule)
+Multiplier = Union[float, np.ndarray]
+
+
+@dataclass
+class TrendSchedule:
+    """
+    A trend multiplier which changes over the forecast, i.e. 100% for
+    the next quarter easing to 40% by year three is
+
+        TrendSchedule(points = [(0, 1.0), (90, 1.0), (1095, 0.4)])
+
+    points are (days after the forecast starts, multiplier). With ramp
+    the multiplier moves in a straight line between the points, 
+    otherwise each one holds until the next. Before the first point 
+    and after the last the multiplier stays where it is.
+    """
+
+    points: list[Tuple[float, float]]
+    ramp: bool = True
+
+    def multipliers(
+            self,
+            dates: pd.Series,
+            ) -> np.ndarray:
+        """
+        The multiplier for each forecast date.
+        """
+
+        dates = pd.to_datetime(pd.Series(dates))
+        days = ((dates - dates.iloc[0]) / pd.Timedelta(days=1)).to_numpy(dtype=float)
+
+        points = sorted(self.points)
+        point_days = np.array([d for d, _ in points], dtype=float)
+        point_values = np.array([m for _, m in points], dtype=float)
+
+        if self.ramp:
+            return np.interp(days, point_days, point_values)
+
+        steps = np.searchsorted(point_days, days, side="right") - 1
+        return point_values[steps.clip(min = 0)]
+
+
+def parse_trend_schedule(
+        text: str,
+        ramp: bool = True,
+        ) -> TrendSchedule:
+    """
+    A TrendSchedule from "days:percent" pairs, i.e. "0:100, 90:100, 1095:40".
+    """
+
+    points = []
+    for part in text.replace(";", ",").split(","):
+        if not part.strip():
+            continue
+
+        try:
+            days, percent = part.split(":")
+            points.append((float(days), float(percent.strip().rstrip("%")) / 100))
+        except ValueError:
+            raise ValueError(f"""
+We couldn't read "{part.strip()}" in the trend schedule.
+
+Each step should be the days after the forecast starts and the trend
+percentage, separated by a colon, i.e. "0:100, 90:100, 1095:40".""")
+
+    if not points:
+        raise ValueError("The trend schedule needs at least one step, i.e. \"0:100\"")
+
+    if any(days < 0 for days, _ in points):
+        raise ValueError("The days in the trend schedule can't be negative")
+
+    return TrendSchedule(points = points, ramp = ramp)
+
+
+# The forecast columns the trend adjustment changes
+ADJUSTED_COLUMNS = ["yhat", "yhat_lower", "yhat_upper"]
+
+
+def adjust_forecast(
+        forecast_df: pd.DataFrame,
+        multiplier: Multiplier,
+        scale_bounds: bool,
+        use_log_scale: bool,
+        ) -> pd.DataFrame:
+    """
+    Apply the trend multiplier (one value, or one per row) to a 
+    forecast, then put yhat and the bounds back on the same scale 
+    as the uploaded data.
+    """
+
+    # Fill the new columns in place, rather than allocating each one
+    values = np.empty((len(ADJUSTED_COLUMNS), len(forecast_df)))
+    trend_lookup(
+        forecast_df = forecast_df,
+        scale_bounds = scale_bounds,
+        use_log_scale = use_log_scale,
+        ).adjusted(multiplier, out = values)
+
+    adjusted = forecast_df.copy()
+    for i, c in enumerate(ADJUSTED_COLUMNS):
+        adjusted[c] = values[i]
+
+    return adjusted
+
+
+@dataclass
+class TrendLookup:
+    """
+    Everything needed to adjust a forecast's trend to any multiplier.
+
+    The adjusted forecast (before undoing the log scale) is 
+    base + multiplier * slope, one row per ADJUSTED_COLUMNS, so it's
+    worked out once per forecast and each multiplier is just arrays.
+    """
+
+    base: np.ndarray
+    slope: np.ndarray
+    # Which of ADJUSTED_COLUMNS are kept above 0 (before undoing the log scale)
+    clip: np.ndarray
+    scale_bounds: bool
+    use_log_scale: bool
+
+    def adjusted(
+            self,
+            multiplier: Multiplier,
+            out: Optional[np.ndarray] = None,
+            ) -> np.ndarray:
+        """
+        The adjusted yhat, yhat_lower and yhat_upper (one row each), on
+        the same scale as the uploaded data. multiplier can be one value
+        or one per forecast row (i.e. from TrendSchedule.multipliers).
+
+        Pass an array the shape of base as out to fill it in place.
+        """
+
+        out = np.multiply(self.slope, multiplier, out = out)
+        out += self.base
+
+        for i in np.flatnonzero(self.clip):
+            np.maximum(out[i], 0, out = out[i])
+
+        # exp is never below 0 so no need to clip
+        if self.use_log_scale:
+            np.exp(out, out = out)
+
+        return out
+
+    def all_adjusted(
+            self,
+            multipliers: list[float],
+            ) -> np.ndarray:
+        """
+        adjusted for every multiplier at once, with the multiplier
+        as the first dimension.
+        """
+
+        values = np.empty((len(multipliers),) + self.base.shape)
+        for i, multiplier in enumerate(multipliers):
+            self.adjusted(multiplier, out = values[i])
+
+        return values
+
+
+def trend_lookup(
+        forecast_df: pd.DataFrame,
+        scale_bounds: bool,
+        use_log_scale: bool,
+        ) -> TrendLookup:
+    """
+    The TrendLookup for a forecast, which gives the same answers as 
+    reverse_engineer_forecast_for_trend followed by untransform_forecast
+    without going through a dataframe for each multiplier.
+    """
+
+    def zero_trend(line):
+        # What the forecast would be if the trend stayed at its first value
+        first_trend_val = forecast_df[f"trend{line}"].to_numpy(dtype=float)[0]
+        return first_trend_val * (1 + forecast_df[f"multiplicative_terms{line}"].to_numpy(dtype=float))
+
+    yhat = forecast_df["yhat"].to_numpy(dtype=float)
+    yhat_zero = zero_trend("")
+    yhat_diff = yhat - yhat_zero
+
+    base = [yhat_zero]
+    slope = [yhat_diff]
+
+    for line in ["_lower", "_upper"]:
+        bound = forecast_df[f"yhat{line}"].to_numpy(dtype=float)
+
+        if scale_bounds:
+            # The bounds get the same treatment as yhat
+            bound_zero = zero_trend(line)
+            base.append(bound_zero)
+            slope.append(bound - bound_zero)
+        else:
+            # The bounds move by as much as yhat does
+            base.append(bound + yhat_diff)
+            slope.append(-yhat_diff)
+
+    return TrendLookup(
+        base = np.vstack(base),
+        slope = np.vstack(slope),
+        clip = np.array([False, not scale_bounds, not scale_bounds]),
+        scale_bounds = scale_bounds,
+        use_log_scale = use_log_scale,
+    )
+
+
+def output_frame(
+        current: pd.DataFrame,
+        adjusted_forecast: pd.DataFrame,
+        date_col: str,
+        target_col: str,
+        ) -> pd.DataFrame:
+    """
+    The historic data followed by the adjusted forecast, with the
+    user's own column names (the same as the download in the app).
+    """
+
+    output = pd.concat([current, adjusted_forecast])[
+        ["ds", "y", "yhat", "yhat_upper", "yhat_lower"]
+        ]
+
+    return output.rename(
+        columns={
+        "ds": date_col, 
+        "y": target_col,
+        "yhat": f"{target_col}_forecast",
+        "yhat_upper": f"{target_col}_upper",
+        "yhat_lower": f"{target_col}_lower",
+        }
+        )
+
+
+def reverse_engineer_forecast_for_trend(
+        forecast_df: pd.DataFrame,
+        multiplier: Multiplier,
+        scale_bounds: bool,
+        debug: bool = False,
+        ) -> Dict[str, np.ndarray]:
+    
+    """
+    For each day - calculate what the prediction would be if trend
+    for every future predicted day was exactly the same as the 
+    very first day. Calculate the difference between that and actual
+    and use that to be "100% trend applied".
+
+    Take multiplier and multiply the difference by that (multiplier 
+    can be an array with a value for each day, see TrendSchedule).
+
+    Then add the new difference onto yhat, yhat_upper, and yhat_lower.
+
+    This logic thanks to David Westby.
+
+    forecast_df isn't changed, the adjusted values come back as arrays
+    named yhat_adjusted, yhat_lower_adjusted and yhat_upper_adjusted.
+    With debug the working (i.e. yhat_zero_trend and _trend_diff) 
+    comes back too, named as the columns it used to be.
+
+    The app and batch job use TrendLookup, which is faster, this
+    spells out the steps and is what TrendLookup is tested against.
+    """
+
+    list_to_scale = [""]
+    list_to_manually_adjust = ["_lower", "_upper"]
+
+    if scale_bounds:
+        list_to_scale = ["", "_lower", "_upper"]
+        list_to_manually_adjust = []
+
+    result = {}
+
+    for line in list_to_scale:
+        # Loop through standard, lower, and upper forecasts
+
+        first_trend_val = forecast_df[f"trend{line}"].iloc[0]
+
+        # What the forecast would be if the trend stayed at its first value
+        zero_trend = np.add(forecast_df[f"multiplicative_terms{line}"].to_numpy(dtype=float), 1)
+        zero_trend *= first_trend_val
+
+        # Get the difference between new and original
+        # This is "100%" difference where actual is 100
+        # and no trend change is 0
+        adjusted = np.subtract(forecast_df[f"yhat{line}"].to_numpy(dtype=float), zero_trend)
+
+        if debug:
+            result[f"yhat{line}_fixed_trend"] = np.full(len(zero_trend), first_trend_val, dtype=float)
+            result[f"yhat{line}_zero_trend"] = zero_trend.copy()
+            result[f"{line}_trend_diff"] = adjusted.copy()
+
+        # Multiply that difference by the multiplier
+        adjusted *= multiplier
+
+        if debug:
+            result[f"{line}_trend_diff_to_use"] = adjusted.copy()
+
+        # Add that difference to get final adjusted value
+        # We can add because the number we're adding is multiplicative
+        # if our "constant trend" value is lower than actual we'll
+        # automatically subtract, if it's higher we'll automatically add on
+        adjusted += zero_trend
+        result[f"yhat{line}_adjusted"] = adjusted
+    
+    if list_to_manually_adjust:
+        # Recalculate difference based on difference between original and new yhat
+        yhat_diff = np.subtract(result["yhat_adjusted"], forecast_df["yhat"].to_numpy(dtype=float))
+
+    for line in list_to_manually_adjust:
+        # Loop through upper and lower lines if appropriate
+
+        adjusted = np.subtract(forecast_df[f"yhat{line}"].to_numpy(dtype=float), yhat_diff)
+
+        # Adjust to make sure that is 0 at minimum
+        np.maximum(adjusted, 0, out = adjusted)
+        result[f"yhat{line}_adjusted"] = adjusted
+
+    return result
@@ -1,6 +1,69 @@
 import holidays
+import pandas as pd
+from functools import lru_cache
+from prophet.make_holidays import make_holidays_df # type: ignore
+
+
+# How many years after the end of the data we include holidays for,
+# which covers the longest forecast we'd generate with room to spare
+YEARS_AHEAD = 10
+
+
+@lru_cache(maxsize=None)
+def supported_countries() -> tuple[str, ...]:
+    # The holidays package works this out from scratch each time,
+    # so only ask it once per process
+    return tuple(holidays.list_supported_countries())
 
 
 def return_available_countries():
     # Get the list of available countries
-    return ["None"]+[country for country in holidays.list_supported_countries()]
+    return ["None"] + list(supported_countries())
+
+
+@lru_cache(maxsize=256)
+def country_holidays(
+        country: str,
+        first_year: int,
+        last_year: int,
+        ) -> pd.DataFrame:
+    """
+    The holidays for one country (in the format Prophet expects,
+    i.e. ds and holiday columns) between two years.
+
+    Each country and range of years is only built once per process,
+    so don't change the frame that comes back.
+    """
+
+    return make_holidays_df(
+        year_list = list(range(first_year, last_year + 1)),
+        country = country)
+
+
+def holidays_frame(
+        countries: list[str],
+        dates: pd.Series,
+        ) -> pd.DataFrame:
+    """
+    The holidays for all of the countries, from the start of the
+    dates until YEARS_AHEAD years after the end of them, ready to
+    pass to Prophet(holidays=...).
+
+    Holidays which more than one of the countries share (i.e.
+    "New Year's Day") only appear once. The frame is a copy, as
+    Prophet changes the one it's given.
+    """
+
+    dates = pd.to_datetime(dates)
+    first_year = int(dates.min().year)
+    last_year = int(dates.max().year) + YEARS_AHEAD
+
+    frames = [
+        country_holidays(country, first_year, last_year)
+        for country in countries
+        ]
+
+    if len(frames) == 1:
+        return frames[0].copy()
+
+    return pd.concat(frames, ignore_index=True).drop_duplicates(subset=["ds", "holiday"], ignore_index=True)
@@ -0,0 +1,213 @@
+"""
+Fit Prophet models in a background process, so the app can keep
+responding (and the user can cancel) while a model is being fitted.
+
+Nothing here uses Streamlit, the app keeps the FitJob in its session
+and polls it on each rerun.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from typing import Optional
+
+import pandas as pd
+from prophet import Prophet # type: ignore
+from prophet.serialize import model_from_json, model_to_json # type: ignore
+
+import forecast_core as fc
+
+
+# Spawn rather than fork, the app runs scripts in threads and
+# forking a process with threads running can deadlock
+_CONTEXT = multiprocessing.get_context("spawn")
+
+# A job nobody has checked on for this long belongs to a session which
+# has gone (i.e. the page was reloaded for a new upload) so we stop it
+ABANDON_AFTER_SECONDS = 60
+
+# Rough share of the work done by the start of each stage, for the progress bar
+STAGE_PROGRESS = {
+    "starting": 0.0,
+    "fitting": 0.1,
+    "done": 1.0,
+}
+
+_active_jobs: set["FitJob"] = set()
+_active_jobs_lock = threading.Lock()
+
+
+def available_cores() -> int:
+    # The cores this process is allowed to use (which can be
+    # fewer than the machine has, i.e. in a container)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def quiet_logging() -> None:
+    # Prophet and cmdstanpy log every fit, which drowns out everything else.
+    # cmdstanpy sets its own level when it first logs, so filter instead
+    for name in ["prophet", "cmdstanpy"]:
+        logging.getLogger(name).addFilter(lambda record: record.levelno >= logging.WARNING)
+
+
+def _run_fit(
+        conn,
+        df: pd.DataFrame,
+        config: fc.ModelConfig,
+        use_cache: bool,
+        ) -> None:
+    # Runs in the background process, sends (message type, value)
+    # tuples back to the app
+    quiet_logging()
+
+    try:
+        conn.send(("stage", "fitting"))
+        m = fc.fit_model(df = df, config = config, use_cache = use_cache)
+        # The fingerprint doesn't survive the json, so send it alongside
+        conn.send(("done", (model_to_json(m), fc.model_fingerprint(m))))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {str(e).strip()}"))
+    finally:
+        conn.close()
+
+
+class FitJob:
+    """
+    A model being fitted in its own process.
+
+    Call poll() to pick up any progress, then check status, which is
+    one of "running", "done", "failed" or "cancelled".
+    """
+
+    def __init__(
+            self,
+            df: pd.DataFrame,
+            config: fc.ModelConfig,
+            use_cache: bool = fc.MODEL_CACHE,
+            ) -> None:
+
+        cancel_abandoned_jobs()
+
+        self.status = "running"
+        self.stage = "starting"
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.last_polled = self.started
+        self._model_json: Optional[str] = None
+        self._fingerprint: Optional[str] = None
+
+        self._conn, child_conn = _CONTEXT.Pipe(duplex=False)
+        self._process = _CONTEXT.Process(
+            target = _run_fit,
+            args = (child_conn, df, config, use_cache),
+            daemon = True)
+        self._process.start()
+
+        # The child has its own copy now
+        child_conn.close()
+
+        with _active_jobs_lock:
+            _active_jobs.add(self)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def progress(self) -> float:
+        return STAGE_PROGRESS.get(self.stage, 0.0)
+
+    def poll(self) -> str:
+        """
+        Pick up any messages from the background process without
+        waiting, and return the job's status.
+        """
+
+        self.last_polled = time.monotonic()
+
+        if self.status != "running":
+            return self.status
+
+        # Checked before reading, so anything the process sent before
+        # it exited is picked up below
+        exited = self._process.exitcode is not None
+
+        try:
+            while self._conn.poll():
+                message, value = self._conn.recv()
+
+                if message == "stage":
+                    self.stage = value
+                elif message == "done":
+                    self._model_json, self._fingerprint = value
+                    self.stage = "done"
+                    self._finish("done")
+                    break
+                elif message == "error":
+                    self.error = value
+                    self._finish("failed")
+                    break
+
+        except (EOFError, OSError):
+            # The process has closed its end (or died part way through
+            # sending) without a result
+            exited = True
+
+        if self.status == "running" and exited:
+            self.error = "The model stopped fitting unexpectedly, please try again."
+            self._finish("failed")
+
+        return self.status
+
+    def result(self) -> Prophet:
+        """
+        The fitted model, once the status is "done".
+        """
+
+        if self._model_json is None:
+            raise ValueError(f"This model isn't ready (the job is {self.status})")
+
+        return fc.set_model_fingerprint(model_from_json(self._model_json), self._fingerprint)
+
+    def cancel(self) -> None:
+        """
+        Stop fitting straight away (without waiting for the process).
+        """
+
+        if self.status != "running":
+            return
+
+        if self._process.is_alive():
+            self._process.terminate()
+
+        self._finish("cancelled")
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self._conn.close()
+
+        # Tidy up the finished process (without waiting for it)
+        self._process.join(timeout = 0)
+
+        with _active_jobs_lock:
+            _active_jobs.discard(self)
+
+
+def cancel_abandoned_jobs(
+        max_idle_seconds: float = ABANDON_AFTER_SECONDS
+        ) -> None:
+    """
+    Cancel any running jobs which haven't been polled for a while.
+    """
+
+    now = time.monotonic()
+
+    with _active_jobs_lock:
+        abandoned = [job for job in _active_jobs if now - job.last_polled > max_idle_seconds]
+
+    for job in abandoned:
+        job.cancel()
@@ -7,6 +7,9 @@ import seaborn as sns #type: ignore
 import charting_helpers as ch
 import datetime as datetime
 import handle_holiday_list as hh
+import cache_helpers as cah
+import backtest_helpers as bth
+import time
 
 # Tracking decorator
 import ga4py.add_tracker as add_tracker
@@ -64,8 +67,11 @@ def handle_uploaded_file() -> Tuple[pd.DataFrame, str, str, list]:
     if st.session_state.step == "upload":
         st.session_state.step = "columns"
 
-        # Read file
-        data = pd.read_csv(st.session_state.uploaded_file)
+        # Any model we were fitting was for the last upload
+        cancel_fitting()
+
+        # Read just the header first so we can fail fast
+        header = pdh.read_csv_header(st.session_state.uploaded_file)
 
         # Add tracking at this point of the process, as a sign a user has started using the tool
         tracking_args_dict = st.session_state.basic_tracking_info.copy()
@@ -73,23 +79,28 @@ def handle_uploaded_file() -> Tuple[pd.DataFrame, str, str, list]:
         tracking_args_dict["stage"] = "upload_file"
 
         # Check it has the right columns
-        pdh.check_columns(data, ga4py_args_remove = tracking_args_dict)
+        pdh.check_columns(header, ga4py_args_remove = tracking_args_dict)
+
+        # Hash the file contents so we can tell if we've seen it before
+        st.session_state.upload_hash = cah.hash_file(st.session_state.uploaded_file)
 
-        st.session_state.file_data = data
+        # Stream through the file for the preview, we only read
+        # the full data once we know which columns are needed
+        st.session_state.file_preview = pdh.preview_csv(st.session_state.uploaded_file)
 
 
         st.experimental_rerun()
 
-    # Read and display the data
-    data = st.session_state.file_data
+    # Display the top and bottom of the data
+    preview_head, preview_tail, _ = st.session_state.file_preview
     st.write("""### Example top and bottom rows of your CSV:
 Use these to make sure everything looks right.             
 
 *First 5rows:*
              """)
-    st.write(data.head())
+    st.write(preview_head)
     st.write("*Last 5 rows:*")
-    st.write(data.tail())
+    st.write(preview_tail)
 
     # Logic for choosing columns
     if "date_col_index" not in locals():
@@ -102,7 +113,7 @@ Use these to make sure everything looks right.
             target_metric_col_index,
             regressor_options, 
             default_regressor_cols,
-            ) = pdh.choose_columns(df = data) 
+            ) = pdh.choose_columns(df = preview_head) 
         
 
     # Show column choosers
@@ -111,7 +122,7 @@ Use these to make sure everything looks right.
     
         # Selection for Date column
         st.session_state.date_col = st.selectbox("""Select the Date column (by default will select any column called 'Date'):""", 
-                                        options=data.columns, 
+                                        options=preview_head.columns, 
                                         index=date_col_index, 
                                         disabled=st.session_state.step != "columns"
                                         )
@@ -137,20 +148,58 @@ Use these to make sure everything looks right.
         regressor_cols = st.session_state.regressor_col_list
 
 
-        available_countries = hh.return_available_countries()
+        # Selection for Series column (for long format data)
+        series_options = ["None"] + [
+            col for col in target_metrics_options 
+            if col != target_metric_col and col not in regressor_cols]
+        series_col_index = 0
+        if st.session_state.series_col in series_options:
+            series_col_index = series_options.index(st.session_state.series_col)
+
+        series_col_choice = st.selectbox("**Optional** if your data has more than one series (i.e. one row per date for each product), select the column which says which series each row is in:", 
+                                        options=series_options,
+                                        index=series_col_index,
+                                        disabled=st.session_state.step != "columns"
+                                        )
+        st.session_state.series_col = None if series_col_choice == "None" else series_col_choice
+        series_col = st.session_state.series_col
+
 
-        st.session_state.holiday_country = st.selectbox("**Optional** choose country (this will automatically pull in some basic holidays for that country which can help the Machine Learning understand seasonal patterns better):", 
+        available_countries = hh.supported_countries()
+
+        st.session_state.holiday_countries = st.multiselect("**Optional** choose countries (this will automatically pull in some basic holidays for those countries which can help the Machine Learning understand seasonal patterns better):", 
                                         options=available_countries,
+                                        default=st.session_state.holiday_countries,
                                         disabled=st.session_state.step != "columns"
                                         )
         
 
+        duplicate_date_option = st.selectbox("If the same date appears in more than one row:", 
+                                        options=list(pdh.DUPLICATE_DATE_OPTIONS),
+                                        disabled=st.session_state.step != "columns"
+                                        )
+        st.session_state.duplicate_dates = pdh.DUPLICATE_DATE_OPTIONS[duplicate_date_option]
+
+
         # Checkbox with a label and tooltip
         st.session_state.use_log_scale = st.checkbox(
             'Use log scale', 
             help='Sometimes Machine Learning forecasts can give unhelpful answers (i.e. predicting negative traffic based on a past trend). Using a log scale can help you avoid that problem',
             value=False,
             disabled=st.session_state.step != "columns")
+
+
+        interval_labels = {
+            "full": "Full (most accurate)",
+            "reduced": "Reduced (quicker, a bit rougher)",
+            "none": "None (quickest, just the forecast line)",
+        }
+        st.session_state.interval_mode = st.selectbox("Uncertainty intervals (the upper and lower bounds around the forecast):", 
+                                        options=list(interval_labels),
+                                        format_func=lambda mode: interval_labels[mode],
+                                        index=list(interval_labels).index(st.session_state.interval_mode),
+                                        disabled=st.session_state.step != "columns"
+                                        )
         
 
         
@@ -177,30 +226,176 @@ st.session_state.regressor_col_list != default_regressor_cols: {st.session_state
         st.write(f"Date column: {date_col}")
         st.write(f"Target Metric column: {target_metric_col}")
         st.write(f"Regressor columns: {', '.join(regressor_cols) if regressor_cols else 'None'}")
-        st.write(f"Target country (for automatically including national holidays in ML context): {st.session_state.holiday_country}")
+        st.write(f"Series column: {series_col if series_col else 'None'}")
+        st.write(f"Target countries (for automatically including national holidays in ML context): {', '.join(st.session_state.holiday_countries) if st.session_state.holiday_countries else 'None'}")
+        st.write(f"Repeated dates: {duplicate_date_option}")
 
         # Display button to submit data
         user_clicks_submit = st.button("Submit")
         if user_clicks_submit:
+            # If we've already checked this file with these columns
+            # we can skip straight to the checked data
+            st.session_state.upload_cache_key = pdh.upload_cache_key(
+                file_hash = st.session_state.upload_hash,
+                date_col = date_col,
+                target_col = target_metric_col,
+                regressor_cols = regressor_cols,
+                duplicate_dates = st.session_state.duplicate_dates,
+                compact = st.session_state.compact_dtypes,
+                series_col = series_col
+            )
+            if series_col is None:
+                st.session_state.checked_data = pdh.load_checked_data(
+                    key = st.session_state.upload_cache_key
+                )
+            else:
+                st.session_state.checked_data = pdh.load_checked_long_data(
+                    key = st.session_state.upload_cache_key
+                )
+
+            if st.session_state.checked_data is None:
+                # Read (and check) only the columns we need, in chunks
+                st.session_state.file_data = pdh.read_csv_in_chunks(
+                    file = st.session_state.uploaded_file,
+                    date_col = date_col,
+                    numeric_cols = [target_metric_col] + regressor_cols,
+                    series_col = series_col
+                )
             sth.update_step_state(previous_step = "columns", new_step = "dates")
         
+        data = st.session_state.file_data
+
         return data, date_col, target_metric_col, regressor_cols
 
 
-def handle_dates_checks(data, date_col, target_metric_col, regressor_cols):
-# Handle date column
-        (current_data,
-            future_data,
-            current_plus_future) = pdh.check_and_convert_data(
-            df = data, 
-            date_col=date_col,
-            target_col=target_metric_col,
-            regressor_cols=regressor_cols
-            )
+def handle_long_dates_checks(data, date_col, target_metric_col, regressor_cols, series_col):
+        
+        if st.session_state.checked_data is not None:
+            (long_data,
+                series_bounds,
+                st.session_state.data_changes,
+                st.session_state.data_frequency) = st.session_state.checked_data
+            st.session_state.data_checked = True
+
+        else:
+            # Check every series at once
+            (long_data,
+                series_bounds) = pdh.check_and_convert_long_data(
+                df = data, 
+                date_col=date_col,
+                target_col=target_metric_col,
+                regressor_cols=regressor_cols,
+                series_col=series_col,
+                duplicate_dates=st.session_state.duplicate_dates,
+                compact=st.session_state.compact_dtypes
+                )
+            
+            if st.session_state.data_checked:
+                pdh.save_checked_long_data(
+                    key = st.session_state.upload_cache_key,
+                    df = long_data,
+                    series_bounds = series_bounds,
+                    data_changes = st.session_state.data_changes,
+                    data_frequency = st.session_state.data_frequency
+                )
+                st.session_state.checked_data = (
+                    long_data, 
+                    series_bounds, 
+                    st.session_state.data_changes,
+                    st.session_state.data_frequency)
+
+        if not st.session_state.data_checked:
+            return long_data, long_data, long_data
+
+        st.write(f"Your data has {len(series_bounds)} series.")
+
+        series_options = series_bounds.index.tolist()
+        series_index = 0
+        if st.session_state.selected_series in series_options:
+            series_index = series_options.index(st.session_state.selected_series)
+
+        selected_series = st.selectbox("Which series do you want to forecast?", 
+                                        options=series_options,
+                                        index=series_index,
+                                        disabled=st.session_state.step != "dates"
+                                        )
+
+        # A different series needs a different model
+        if selected_series != st.session_state.selected_series:
+            st.session_state.selected_series = selected_series
+            cancel_fitting()
+            if "prophet_model" in st.session_state:
+                del st.session_state.prophet_model
+
+        # These are views of the long data, not copies
+        return pdh.series_split(
+            df = long_data, 
+            series_bounds = series_bounds, 
+            series_id = selected_series)
+
+
+def handle_dates_checks(data, date_col, target_metric_col, regressor_cols, series_col = None):
+        
+        if series_col is not None:
+            (current_data,
+                future_data,
+                current_plus_future) = handle_long_dates_checks(
+                data = data, 
+                date_col = date_col, 
+                target_metric_col = target_metric_col, 
+                regressor_cols = regressor_cols,
+                series_col = series_col)
+
+        elif st.session_state.checked_data is not None:
+            # Already checked (either earlier in this session
+            # or loaded from the cache)
+            (current_data,
+                future_data,
+                current_plus_future,
+                st.session_state.data_changes,
+                st.session_state.data_frequency) = st.session_state.checked_data
+            st.session_state.data_checked = True
+        
+        else:
+            # Handle date column
+            (current_data,
+                future_data,
+                current_plus_future) = pdh.check_and_convert_data(
+                df = data, 
+                date_col=date_col,
+                target_col=target_metric_col,
+                regressor_cols=regressor_cols,
+                duplicate_dates=st.session_state.duplicate_dates,
+                compact=st.session_state.compact_dtypes
+                )
+            
+            if st.session_state.data_checked:
+                # Save the checked data so we don't have to do this again
+                pdh.save_checked_data(
+                    key = st.session_state.upload_cache_key,
+                    current = current_data,
+                    current_plus_future = current_plus_future,
+                    data_changes = st.session_state.data_changes,
+                    data_frequency = st.session_state.data_frequency
+                )
+                st.session_state.checked_data = (
+                    current_data, 
+                    future_data, 
+                    current_plus_future, 
+                    st.session_state.data_changes,
+                    st.session_state.data_frequency)
         
         if st.session_state.data_checked:
             # Only continue if all the data checks are fine
 
+            # Let the user know if we've changed their data
+            data_changes = st.session_state.data_changes
+            if data_changes["reordered"]:
+                st.write("We've put your data in date order.")
+            if data_changes["rows_combined"] > 0:
+                combined_how = "adding them together" if data_changes["duplicate_dates"] == "sum" else "taking the average"
+                st.write(f"We've combined {data_changes['rows_combined']} rows which had repeated dates by {combined_how}.")
+
             fig = ch.line_plot_highlighting_missing_sections(
                 df = current_plus_future,
                 future_df=future_data,
@@ -218,6 +413,79 @@ def handle_dates_checks(data, date_col, target_metric_col, regressor_cols):
         return current_data, future_data, date_col, target_metric_col, regressor_cols
 
 
+def handle_model_fitting(current_data, regressor_cols):
+
+        # Already fitted (in any session) so no need to wait
+        if st.session_state.fit_job is None:
+            cached_model = pf.load_fitted_prophet(
+                df = current_data,
+                regressor_cols = regressor_cols,
+                data_frequency = st.session_state.data_frequency,
+            )
+            if cached_model is not None:
+                st.session_state.prophet_model = cached_model
+                st.session_state.backtest_scores = None
+                return
+
+            st.session_state.fit_job = pf.start_fitting_prophet(
+                df = current_data,
+                regressor_cols = regressor_cols,
+                data_frequency = st.session_state.data_frequency,
+            )
+
+        job = st.session_state.fit_job
+        status = job.poll()
+
+        if status == "done":
+            st.session_state.prophet_model = job.result()
+            st.session_state.backtest_scores = None
+            st.session_state.fit_job = None
+            return
+
+        if status == "failed":
+            st.session_state.fit_job = None
+            raise ValueError(job.error)
+
+        # Still fitting, show how it's going and check again shortly
+        st.progress(job.progress)
+        st.write(f"Fitting your forecast model, this can take a minute for longer data ({job.elapsed:.0f}s so far)...")
+
+        if st.button("Cancel"):
+            job.cancel()
+            st.session_state.fit_job = None
+            st.session_state.step = "dates"
+
+        time.sleep(0.5)
+        st.experimental_rerun()
+
+
+def chart_frame(current_data, forecast):
+        # The history followed by the forecast dates, with the forecast 
+        # values left blank to be filled in for the chosen trend
+        for_chart = pd.concat(
+            [current_data[["ds", "y"]], forecast[["ds"]]], 
+            ignore_index=True)
+
+        for c in ["yhat", "yhat_lower", "yhat_upper"]:
+            for_chart[c] = float("nan")
+
+        # Keep the time of day for hourly data, otherwise just the date
+        for_chart["ds"] = pd.to_datetime(for_chart["ds"])
+        chart_days = for_chart["ds"].dt.date
+        if st.session_state.data_frequency != "H":
+            for_chart["ds"] = chart_days
+
+        # The date pickers work in days, whatever the frequency
+        return for_chart, chart_days
+
+
+def cancel_fitting():
+    # Stop fitting a model we don't need any more (without waiting for it)
+    if st.session_state.get("fit_job") is not None:
+        st.session_state.fit_job.cancel()
+        st.session_state.fit_job = None
+
+
 @add_tracker.analytics_hit_decorator
 def main() -> None:
 
@@ -327,10 +595,10 @@ Upload a CSV file which has at least two columns:
 
                     
 - You can call your date column and target number column whatever you want, you will have a chance to select them once you've uploaded your data
-- You have to have a valid yyyy-mm-dd date in every single row
+- You have to have a valid date in every single row (yyyy-mm-dd works best, but we can also read formats like dd/mm/yyyy as long as every row uses the same one)
 - Unless you are leaving a gap at the end for the forecast (see below), you have to have a number in every single row of your "number to forecast" column
                     
-If you fill every row of your uploaded data, we'll automatically create a forecast for the next 3 years (and then you can use as much or as little of it as you want)
+If you fill every row of your uploaded data, we'll automatically create a forecast for the next 3 years (or 90 days for hourly data) at the same frequency as your data - i.e. daily, weekly or monthly (and then you can use as much or as little of it as you want)
 
 ### Leaving some rows blank
 
@@ -438,12 +706,27 @@ You have a couple of options:
         # Flag for if file uploaded
         st.session_state.uploaded_file = None
         st.session_state.file_data = None
+        st.session_state.file_preview = None
+        st.session_state.upload_hash = None
+        st.session_state.upload_cache_key = None
+        st.session_state.checked_data = None
+        st.session_state.fit_job = None
+        st.session_state.backtest_scores = None
+        st.session_state.trend_lookup = None
 
         # Column defaults
         st.session_state.date_col = None
         st.session_state.target_metric_col = None
         st.session_state.regressor_col_list = None
-        st.session_state.holiday_country = "None"
+        st.session_state.holiday_countries = []
+        st.session_state.duplicate_dates = None
+        st.session_state.interval_mode = "full"
+        st.session_state.series_col = None
+        st.session_state.selected_series = None
+
+        # Memory saving mode (set by whoever runs the server)
+        st.session_state.compact_dtypes = pdh.COMPACT_DTYPES
+        st.session_state.compact_bytes_saved = 0
 
         # Basic information for tracking hits
         basic_tracking_info: MeasurementArguments = {
@@ -480,7 +763,8 @@ You have a couple of options:
                     data = data, 
                     date_col = date_col, 
                     target_metric_col = target_metric_col, 
-                    regressor_cols = regressor_cols
+                    regressor_cols = regressor_cols,
+                    series_col = st.session_state.series_col
                     )
             
             st.session_state.current_data = current_data 
@@ -496,9 +780,10 @@ You have a couple of options:
 
         # Avoid retraining if not necessary
         if "prophet_model" not in st.session_state:
-            # Train model
-            st.session_state.prophet_model = pf.create_and_fit_prophet(
-                df = current_data,
+            # Train model (in the background, this reruns the page 
+            # until the model is ready)
+            handle_model_fitting(
+                current_data = current_data,
                 regressor_cols = regressor_cols,
             )
 
@@ -507,12 +792,32 @@ You have a couple of options:
             tracking_args_dict["skip_stage"] = ["start", "end"]
             tracking_args_dict["stage"] = "generate_forecast"
 
-            # Make prediction
+            # Make prediction, just the point forecast to start with so
+            # we can show it straight away, the intervals come after.
+            # Unless we've predicted this before (i.e. in an earlier 
+            # session) in which case the intervals come from the cache
+            interval_mode = "none"
+            if pf.forecast_is_cached(
+                    fitted_model = st.session_state.prophet_model,
+                    future_data = future_data,
+                    interval_mode = st.session_state.interval_mode):
+                interval_mode = st.session_state.interval_mode
+
             st.session_state.prophet_forecast = pf.create_forecast(
                         fitted_model = st.session_state.prophet_model,
                         future_data = future_data,
+                        interval_mode = interval_mode,
                         ga4py_args_remove = tracking_args_dict
                         )
+            st.session_state.forecast_interval_mode = interval_mode
+            
+            if st.session_state.compact_dtypes:
+                st.session_state.prophet_forecast, bytes_saved = pdh.compact_dtypes(
+                    st.session_state.prophet_forecast)
+                pdh.record_bytes_saved(bytes_saved)
+
+            # Worked out from the forecast when it's first shown
+            st.session_state.trend_lookup = None
         
         prophet_forecast = st.session_state.prophet_forecast
 
@@ -525,12 +830,13 @@ You have a couple of options:
 
             if "default_trend_adjustment" not in st.session_state:
                 st.session_state.default_trend_adjustment = 100
+                st.session_state.trend_description = "at 100%"
 
             st.markdown(f"""
                         
 ### Adjust trend
 
-Your Machine Learning forecast is below. **The 'trend' is applied at {st.session_state.default_trend_adjustment}% strength.**                        
+Your Machine Learning forecast is below. **The 'trend' is applied {st.session_state.trend_description} strength.**                        
 
 Use the slider below to adjust the forecast trend. 
                         
@@ -541,67 +847,118 @@ Adjust the slider if you think that trend is too strong or too weak, when you're
                         
                         """)
 
-            # Adjust prediction
-            trend_adjustment = st.slider(
-                label = "trend adjustment",
-                min_value = 0,
-                max_value = 100,
-                value = 100,
-                step = 5,
-                format="%d%%"
-                )/100
-            
-            
-            trend_percent = int((trend_adjustment/1)*100)
-
             # Checkbox with a label and tooltip
             scale_bounds = st.checkbox(
                 'Scale bounds with trend', 
                 help='When you adjust the trend the bounds will normally stay the same distance from the prediction line as they normally would be. If if you want the bounds to scale along with the trend tick this box.',
                 value = True)
-            
-            if trend_percent!= st.session_state.default_trend_adjustment:
-                st.session_state.default_trend_adjustment = trend_percent
-                st.experimental_rerun()
-            
-            adjusted_forecast = pf.reverse_engineer_forecast_for_trend(
-                forecast_df = prophet_forecast,
-                multiplier = trend_adjustment,
-                scale_bounds = scale_bounds
-            )
 
-            # For now - just change the adjusted values to replace the current
-            # values, in the future might want to be able to show current and adjusted
-            # at the same time
-            adjusted_forecast_for_show = adjusted_forecast.copy(deep=True)
+            # The adjusted forecast is linear in the trend strength, so
+            # the parts of it (and the chart data) are worked out once
+            # per forecast, then each slider position just fills in the
+            # forecast rows of the chart
+            if (st.session_state.trend_lookup is None 
+                    or st.session_state.trend_lookup.scale_bounds != scale_bounds):
+                st.session_state.trend_lookup = pf.trend_lookup(
+                    forecast_df = prophet_forecast,
+                    scale_bounds = scale_bounds
+                )
+                st.session_state.for_chart, st.session_state.chart_days = chart_frame(
+                    current_data = current_data,
+                    forecast = prophet_forecast
+                )
 
+            # Adjust prediction
+            if ch.BROWSER_SLIDER:
+                # The slider redraws its own chart in the browser as it
+                # moves, the rest of the page catches up when the user
+                # clicks "Use this trend"
+                chart_days = st.session_state.chart_days
+                chosen_percent = None
+
+                # Its chart and download only know about one trend strength,
+                # so leave it out while a schedule (below) replaces it
+                if not st.session_state.get("use_trend_schedule", False):
+                    chosen_percent = ch.trend_slider(
+                        lookup = st.session_state.trend_lookup,
+                        for_chart = st.session_state.for_chart,
+                        history_rows = len(current_data),
+                        value = st.session_state.default_trend_adjustment,
+                        columns = [
+                            date_col, 
+                            target_metric_col, 
+                            f"{target_metric_col}_forecast", 
+                            f"{target_metric_col}_upper", 
+                            f"{target_metric_col}_lower"
+                            ],
+                        file_name = f"{target_metric_col} forecast {chart_days.min()} to {chart_days.max()} - trend at {{percent}}.csv"
+                        )
 
-            for c in ["yhat", "yhat_lower", "yhat_upper"]:
-                adjusted_forecast_for_show[c] = adjusted_forecast_for_show[f"{c}_adjusted"]
+                if chosen_percent is None:
+                    chosen_percent = st.session_state.default_trend_adjustment
+                trend_adjustment = chosen_percent/100
+            else:
+                trend_adjustment = st.slider(
+                    label = "trend adjustment",
+                    min_value = 0,
+                    max_value = 100,
+                    value = 100,
+                    step = 5,
+                    format="%d%%"
+                    )/100
             
-            # Make sure we refuse the earlier log transform so our forecast is on the 
-            # same scale as the input data
-            adjusted_forecast_for_show = pf.transform_forecast(
-                df = adjusted_forecast_for_show,
-                columns_to_adjust=["yhat", "yhat_lower", "yhat_upper"]
-            )
-
-
-
-            # Join original and prediction together
-            for_chart = pd.concat([current_data, adjusted_forecast_for_show])
+            
+            trend_percent = int((trend_adjustment/1)*100)
 
+            trend_description = f"at {trend_percent}%"
+
+            # Or let the trend change over the forecast, i.e. keep it for
+            # the next quarter then ease it off
+            use_trend_schedule = st.checkbox(
+                'Change the trend over time',
+                key = 'use_trend_schedule',
+                help='Set the trend strength for different points in the forecast, as the number of days after the forecast starts and the trend % from then on. For example "0:100, 90:100, 1095:40" keeps the full trend for 90 days then eases it down to 40% by three years. This replaces the slider above.')
+
+            if use_trend_schedule:
+                schedule_text = st.text_input(
+                    "Trend schedule (days after the forecast starts: trend %)",
+                    value = "0:100, 90:100, 1095:40")
+
+                schedule_between = st.selectbox(
+                    "Between the steps in the schedule, the trend",
+                    options = ["eases from one to the next", "jumps at each step"])
+
+                try:
+                    trend_schedule = pf.parse_trend_schedule(
+                        text = schedule_text,
+                        ramp = schedule_between == "eases from one to the next")
+
+                    # One multiplier for each forecast row
+                    trend_adjustment = trend_schedule.multipliers(prophet_forecast["ds"])
+                    trend_description = f"from {trend_adjustment[0]:.0%} to {trend_adjustment[-1]:.0%}"
+                except ValueError as e:
+                    st.write(str(e))
+            
+            if trend_description != st.session_state.trend_description:
+                st.session_state.default_trend_adjustment = trend_percent
+                st.session_state.trend_description = trend_description
+                st.experimental_rerun()
+            
+            for_chart = st.session_state.for_chart
+            chart_days = st.session_state.chart_days
 
-            for_chart["ds"] = pd.to_datetime(for_chart["ds"]).dt.date
+            # The forecast is always the last rows
+            for_chart.iloc[len(current_data):, for_chart.columns.get_indexer(["yhat", "yhat_lower", "yhat_upper"])] = (
+                st.session_state.trend_lookup.adjusted(trend_adjustment).T)
 
             # Give user an option of selecting the first and last dates to show
             # so they can keep the chart filtered
-            earliest_date = for_chart["ds"].min()
+            earliest_date = chart_days.min()
             default_first_date_to_show = earliest_date
             if "default_first_date_to_show" in st.session_state:
                 default_first_date_to_show = st.session_state.default_first_date_to_show
             
-            latest_date = for_chart["ds"].max()
+            latest_date = chart_days.max()
             default_last_date_to_show = latest_date
             if "default_last_date_to_show" in st.session_state:
                 default_last_date_to_show = st.session_state.default_last_date_to_show
@@ -659,11 +1016,8 @@ Choose dates to filter the chart below (this won't change your data)""")
                 last_date_to_show = first_date_to_show+datetime.timedelta(days=1) # type: ignore
 
             filtered_for_chart = for_chart[
-                for_chart["ds"]>=first_date_to_show
-                ]
-
-            filtered_for_chart = filtered_for_chart[
-                filtered_for_chart["ds"]<=last_date_to_show 
+                (chart_days>=first_date_to_show)
+                & (chart_days<=last_date_to_show)
                 ]
 
 
@@ -677,6 +1031,12 @@ Choose dates to filter the chart below (this won't change your data)""")
 
             st.plotly_chart(forecast_fig)   
 
+            if st.session_state.forecast_interval_mode != st.session_state.interval_mode:
+                st.caption("Showing just the forecast line for now, the upper and lower bounds are on their way.")
+
+            if st.session_state.compact_dtypes:
+                st.caption(f"Compact memory mode saved {st.session_state.compact_bytes_saved / 1e6:.1f}MB in this session.")
+
 
             # Give user the option to download their forecast data
             unfiltered_for_download = for_chart[
@@ -701,7 +1061,7 @@ Choose dates to filter the chart below (this won't change your data)""")
 ### Download data
 
                         
-Click download to download your forecast, assuming trend is applied at {trend_percent}% strength.
+Click download to download your forecast, assuming trend is applied {trend_description} strength.
 
 If you want a way to visualise your forecast, you can download the plot above as a png by clicking on the "download plot" button just above the chart.
 
@@ -713,10 +1073,63 @@ Or you can use [Dave Westby's blog post here to create your own chart with this
             st.download_button(
             f"Download forecast",
             csv,
-            f"{target_metric_col} forecast {earliest_date} to {latest_date} - trend at {trend_percent}%.csv",
-            f"{target_metric_col} forecast {earliest_date} to {latest_date} - trend at {trend_percent}%/csv",
+            f"{target_metric_col} forecast {earliest_date} to {latest_date} - trend {trend_description}.csv",
+            f"{target_metric_col} forecast {earliest_date} to {latest_date} - trend {trend_description}/csv",
             key='download-csv'
             )
+
+            # Everything above has been shown with the point forecast, 
+            # now work out the intervals and show them
+            if st.session_state.forecast_interval_mode != st.session_state.interval_mode:
+                with st.spinner("Working out the upper and lower bounds..."):
+                    st.session_state.prophet_forecast = pf.add_intervals(
+                        fitted_model = st.session_state.prophet_model,
+                        future_data = future_data,
+                        interval_mode = st.session_state.interval_mode
+                    )
+
+                    if st.session_state.compact_dtypes:
+                        st.session_state.prophet_forecast, bytes_saved = pdh.compact_dtypes(
+                            st.session_state.prophet_forecast)
+                        pdh.record_bytes_saved(bytes_saved)
+
+                st.session_state.trend_lookup = None
+
+                st.session_state.forecast_interval_mode = st.session_state.interval_mode
+                st.experimental_rerun()
+
+
+            st.markdown(f"""
+-------------
+                        
+### Not sure how strong the trend should be?
+
+We can check how well each trend strength would have forecast your own history, by forecasting the last part of your data from a few earlier dates and comparing with what actually happened.
+
+""")
+
+            # As far ahead as the forecast, but leaving enough history to fit to
+            backtest_horizon = min(len(future_data), len(current_data) // 4)
+
+            if st.session_state.backtest_scores is None and st.button("Check trend strengths"):
+                with st.spinner("Forecasting your history..."):
+                    try:
+                        st.session_state.backtest_scores = pf.backtest_trend(
+                            df = current_data,
+                            regressor_cols = regressor_cols,
+                            horizon = backtest_horizon,
+                            data_frequency = st.session_state.data_frequency,
+                        )
+                    except ValueError as e:
+                        st.write(str(e))
+
+            if st.session_state.backtest_scores is not None:
+                backtest_scores = st.session_state.backtest_scores
+                # The same error as the chart, so the best is the lowest point on it
+                best_percent = int(round(bth.best_multiplier(backtest_scores, metric = "mape") * 100))
+
+                st.write(f"Forecasting {backtest_horizon} rows ahead, a trend at **{best_percent}%** strength would have been closest to what actually happened.")
+                st.line_chart(backtest_scores.set_index("trend_percent")[["mape"]].rename(columns={"mape": "average % error"}))
             
 
             st.markdown(f"""
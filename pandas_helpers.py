@@ -1,12 +1,36 @@
 import streamlit as st
 import st_helpers as sth
+import os
 import pandas as pd
-import numpy as np
-import process_forecast as pf
-from typing import Tuple
-from prophet import Prophet # type: ignore
+import cache_helpers as cah
+import forecast_core as fc
+from typing import Tuple, Union
 import ga4py.add_tracker as add_tracker
 
+# The checks themselves don't need the app, they live in check_helpers
+from check_helpers import (  # noqa: F401
+    CSV_CHUNK_ROWS,
+    DUPLICATE_DATE_OPTIONS,
+    read_csv_header,
+    preview_csv,
+    read_csv_in_chunks,
+    date_parsing_error,
+    date_col_conversion,
+    check_for_data_blocks,
+    check_for_data_blocks_by_series,
+    check_series_ids,
+    find_series_bounds,
+    find_date_issues,
+    sort_by_date,
+    combine_duplicate_dates,
+    check_duplicate_dates,
+    columns_to_numbers,
+    regressor_future_rows_error,
+    compact_dtypes,
+    split_at_boundary,
+    series_split,
+)
+
 @add_tracker.analytics_hit_decorator
 def check_columns(df):
     """
@@ -29,105 +53,20 @@ then refresh the page and try again. Thanks!
 """)
 
 
-def date_col_conversion(
-        df: pd.DataFrame, 
-        date_col: str
-        )-> pd.DataFrame:
-
-    try:
-        df["raw_date"] = pd.to_datetime(df[date_col], format="%Y-%m-%d")
-        df = df.rename(columns={date_col:"ds"}, inplace = False)
-    except Exception as e:
-        raise ValueError(f"There was a problem with reading your date column ({date_col}) - please make sure you've selected the right one, and that all the dates are in YYYY-MM-DD format")
-    
-    return df
-
-
-def check_for_data_blocks(
-        row,
-        target_column: str,
-        date_column: str,
-        list_of_empties: list,
-        regressor_column_list: list[str],
-    ):
-    """
-    check_for_data_blocks 
-
-    This function uses the mutable nature of a list so
-    we can loop through every row in a dataframe and count
-    the number of blanks but ALSO do some checks, i.e.
-    
-    - Make sure that there aren't gaps 
-        (essentially we should see ONLY filled 
-        rows until the first empty row, and then we 
-        should see ONLY empty rows from then until the end). 
-    - Check if there are at least a few empty 'target_column' 
-        rows at the end of our data, if so that's our forecast
-        window, if not we assume we have to generate the forecast window
-    - Check if there are any regressor columns with empty spaces
-        if so that'll cause Prophet to fail so we need to give a 
-        clear and direct error message now so people know what to fix
-    - Check if there are any empty cells in the date column
-        if so that'll cause Prophet to fail so again we need a 
-        clear and direct error message
-
-    Args:
-        row (DataFrame row): the row of the dataframe we're checking
-        target_column (str): the name of the column we're checking
-        date_column (str): the name of the column we'll record in the empty rows list
-        list_of_empties (list): a list of dates for the empty rows
-        regressor_column_list (list[str]): list of regressor columns to check to make sure they're not N/A
-    """
-
-
-
-    # Check if the date column is unexpectedly blank
-    if pd.isna(row[date_column]) or row[date_column]=="":
-        raise ValueError(f"""
-
-It looks like you have a row which has data in it but doesn't have a value
-in the date column ({date_column}). Try checking row {row.name} and make sure
-the date column is filled (and check the rest of the date column while you're at it!)                         
-
-Then refresh this page and try uploading your data again.
-                         
-""")
-
-    date_value = row[date_column]
-
+# Opt-in mode (for servers with lots of sessions) where we keep stored
+# data as float32 rather than float64, only going back to float64 
+# when we hand data to Prophet
+COMPACT_DTYPES = os.getenv("TRENDS_ADJUST_COMPACT_DTYPES") == "yes"
 
-    # check if any of the regressor columns are unexpectedly blank
-    for c in regressor_column_list:
-        if pd.isna(row[c]) or row[c]=="":
-            raise ValueError(f"""
-When you're using regressor columns - you have to put a value in every single row
-for the regressors. In the row for {date_value} your regressor column {c} is empty. 
-Other rows and columns might have the same issue so please check your data, refresh this page
-and try again.""")
-
-    value = row[target_column]
-    if value == "" or pd.isna(value):
-        list_of_empties.append(date_value)
-    
-    else:
-        # Check we haven't had any empties before now
-        if len(list_of_empties)> 0:
-            raise ValueError(f"""
-                             
-You have gaps in your data - when we checked your data, column: {target_column}
-has an entry for date {date_value} but is missing values for {len(list_of_empties)} 
-preceding dates. Here are {min(10,len(list_of_empties))} examples of dates with missing data:
-{list_of_empties[:10]}.
-
-To avoid errors - fix your data (so you have a value in your target column for every
-historic date, and an empty row for every date you want to forecast), reload this page
-and reupload your data.
-
-""")
+# Change this if the checked data would come out differently
+# for the same upload, so old cached uploads aren't used
+UPLOAD_CACHE_VERSION = 3
 
 
 def check_ordering(
-        df: pd.DataFrame) -> Tuple[pd.DataFrame, bool]:
+        df: pd.DataFrame,
+        series_col: Union[str, None] = None,
+        ) -> Tuple[pd.DataFrame, bool]:
     
 
     should_continue = True # Default assumption is no issues
@@ -136,7 +75,8 @@ def check_ordering(
 
     
     # Check the dataframe is ordered correctly
-    date_ordered = df['ds'].is_monotonic_increasing
+    series = None if series_col is None else df[series_col]
+    date_ordered, _ = find_date_issues(df['ds'], series = series)
 
     if not date_ordered:
         should_continue = sth.continue_or_reset("""
@@ -148,129 +88,134 @@ If you want to start again - reload the page.
 
 """)    
         if should_continue:
-            df = df.sort_values('ds').reset_index().drop(columns=["index"])
+            df = sort_by_date(df, series_col = series_col)
 
     print(f"Should continue: {should_continue}") 
 
     return df, should_continue
 
-def columns_to_numbers(df, _col, col_name):
-    # Convert Y and regressor cols to numbers to avoid errors
-    try:
-        df[_col] = df[_col].astype(float)
-    except Exception as e:
-
-        try:
-            # Try removing commas
-            df[_col] = df[_col].str.replace(',', '').astype(float)
-        except Exception as f:
-            print(f"Exception 1: {e}")
-            print(f"Exception 2: {f}")
-            raise ValueError(f"""
-Error converting the data in your target column '{col_name}' to numbers. 
-
-Please check your '{col_name}' column and make sure there's only numbers (or blank cells) in that column.""")
-
 
 def check_and_convert_data(
         df: pd.DataFrame, 
         date_col: str, 
         target_col: str,
-        regressor_cols: list
+        regressor_cols: list,
+        duplicate_dates: Union[str, None] = None,
+        compact: bool = False,
         ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Run the checks in forecast_core.check_data, asking the user
+    before we reorder their data, and keep track of the results
+    in the session.
+    """
 
+    config = fc.DataConfig(
+        date_col = date_col,
+        target_col = target_col,
+        regressor_cols = regressor_cols,
+        duplicate_dates = duplicate_dates,
+        compact = compact,
+    )
 
     # First convert date column and create expected ds column
     df = date_col_conversion(df = df, date_col = date_col)
 
 
     # Then check ordering
+    uploaded_df = df
     df, ordering_should_continue = check_ordering(
         df=df)
     
+    # check_ordering only gives us a new dataframe if it sorted it
+    reordered = df is not uploaded_df
+    
 
     # Only do the rest of this if we should continue
     if not ordering_should_continue:
         return df, df, df # Just returning data, but we shouldn't use it
 
 
-    # Create expected "y" column
-    if target_col!= "y":
-        df = df.rename(columns={target_col:"y"})
+    checked = fc.finish_checks(df = df, config = config, reordered = reordered)
 
-    new_target_col = "y"
-    new_date_col = "raw_date"
+    # Keep track of what we changed so we can tell the user
+    st.session_state.data_changes = checked.data_changes
+    st.session_state.data_frequency = checked.data_frequency
+    record_bytes_saved(checked.bytes_saved)
 
-    # Check that there are some rows in the uploaded data to
-    # make room for a forecast
-    list_of_empty_dates: list = []
+    # Once we've done all the checks - change the session variable
+    st.session_state.data_checked = True
 
-    df.apply(lambda x: check_for_data_blocks(
-        row = x,
-        target_column = new_target_col,
-        date_column = new_date_col,
-        list_of_empties = list_of_empty_dates,
-        regressor_column_list=regressor_cols
-        ), axis = 1)
-    
+    return checked.current, checked.future, checked.current_plus_future
 
-    # Convert the columns to numbers to make sure we don't hit confusing errors later
-    columns_to_numbers(df, "y", target_col)
-    for _col in regressor_cols:
-        columns_to_numbers(df, _col, _col)
 
-    
-    if len(list_of_empty_dates) > 0:
-        current: pd.DataFrame = df[~df[new_date_col].isin(list_of_empty_dates)]
-        future: pd.DataFrame = df[df[new_date_col].isin(list_of_empty_dates)]
-        current_plus_future: pd.DataFrame = df
-    
-    else:
-        # If we have no empty rows we can guess how far in the future
-        # we want to forecast BUT that will mean that our regressor
-        # columns stop (which is no good) so if the user is trying
-        # to use regressors they have to leave empty rows
-
-        if len(regressor_cols) >0:
-            raise ValueError(f"""
-
-You have listed regressor columns ({regressor_cols}).
+def check_and_convert_long_data(
+        df: pd.DataFrame, 
+        date_col: str, 
+        target_col: str,
+        regressor_cols: list,
+        series_col: str,
+        duplicate_dates: Union[str, None] = None,
+        compact: bool = False,
+        ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    The same as check_and_convert_data, but for long format data, 
+    where series_col says which series each row belongs to 
+    (i.e. date, series, value, regressors...).
+
+    Every series is checked at the same time (rather than looping
+    through them) and the data stays as one dataframe, grouped by 
+    series. Use series_split to get the current and future rows for 
+    one series.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: 
+            the checked data (including the future rows), 
+            where each series starts, stops having data and ends (from 
+                check_for_data_blocks_by_series)
+    """
 
-But the column you want to forecast ({target_col}) has an entry for every date.
+    config = fc.DataConfig(
+        date_col = date_col,
+        target_col = target_col,
+        regressor_cols = regressor_cols,
+        series_col = series_col,
+        duplicate_dates = duplicate_dates,
+        compact = compact,
+    )
 
-If you are going to use regressor columns you have to create a row for every date you
-want to forecast. The date and regressor columns have to be filled for those rows
-and the target column ({target_col}) has to be blank.
+    df = date_col_conversion(df = df, date_col = date_col)
+    check_series_ids(df[series_col], series_column = series_col)
 
-That's because regressors are used to influence the forecast, but if they stop on the
-same date that the target column does, they won't do anything!
+    # Check ordering (grouping the series together)
+    uploaded_df = df
+    df, ordering_should_continue = check_ordering(
+        df=df, 
+        series_col=series_col)
+    
+    reordered = df is not uploaded_df
 
-Please reload and either skip using the regressor columns, or add in the extra rows to your data.
+    if not ordering_should_continue:
+        return df, pd.DataFrame(columns=["start", "forecast_start", "end"])
 
-""")
-        
-        # If we're not using regressor columns, we can just generate the dates.
-        current = df
+    checked = fc.finish_long_checks(df = df, config = config, reordered = reordered)
 
-        last_date = current[new_date_col].iloc[-1]
+    st.session_state.data_changes = checked.data_changes
+    st.session_state.data_frequency = checked.data_frequency
+    record_bytes_saved(checked.bytes_saved)
 
-        new_dates = pd.date_range(
-            start=last_date + pd.Timedelta(days=1), 
-            periods=1096, freq='D')
-        
-        future = pd.DataFrame({
-            "ds": new_dates,
-            "y": np.nan
-        })
+    st.session_state.data_checked = True
 
-        current_plus_future = pd.concat([current, future])
-        
+    return checked.data, checked.series_bounds
 
 
-    # Once we've done all the checks - change the session variable
-    st.session_state.data_checked = True
+def record_bytes_saved(
+        bytes_saved: int
+        ) -> None:
+    # Keep a running total for this session so we can report it
+    if "compact_bytes_saved" not in st.session_state:
+        st.session_state.compact_bytes_saved = 0
+    st.session_state.compact_bytes_saved += bytes_saved
 
-    return current, future, current_plus_future
 
 def choose_columns(
         df: pd.DataFrame,
@@ -333,4 +278,133 @@ def choose_columns(
         default_target_col_index,
         regressor_options,
         default_regressors
-        )
\ No newline at end of file
+        )
+
+
+def upload_cache_key(
+        file_hash: str,
+        date_col: str,
+        target_col: str,
+        regressor_cols: list[str],
+        duplicate_dates: Union[str, None] = None,
+        compact: bool = False,
+        series_col: Union[str, None] = None,
+        ) -> str:
+    """
+    Key for the cache of checked data, based on the contents
+    of the uploaded file and the options the user picked.
+    """
+
+    return cah.hash_key(
+        UPLOAD_CACHE_VERSION,
+        file_hash,
+        date_col,
+        target_col,
+        regressor_cols,
+        duplicate_dates,
+        compact,
+        series_col,
+    )
+
+
+def save_checked_data(
+        key: str,
+        current: pd.DataFrame,
+        current_plus_future: pd.DataFrame,
+        data_changes: dict,
+        data_frequency: str,
+        ) -> None:
+
+    # The current data is always the first rows, and the future
+    # data is always the rest, so we only need to save one frame
+    cah.save_frame(
+        df = current_plus_future, 
+        namespace = "uploads", 
+        key = key, 
+        metadata = {
+            "current_rows": len(current),
+            "data_changes": data_changes,
+            "data_frequency": data_frequency,
+            }
+        )
+
+
+def load_checked_data(
+        key: str
+        ) -> Union[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, dict, str], None]:
+    """
+    Load data which has already been through check_and_convert_data 
+    for the same upload and columns.
+
+    Returns None if it's not been cached.
+    """
+
+    cached = cah.load_frame(namespace = "uploads", key = key)
+
+    if cached is None:
+        return None
+    
+    current_plus_future, metadata = cached
+    current_rows = metadata["current_rows"]
+
+    current, future = split_at_boundary(
+        df = current_plus_future, 
+        forecast_start = current_rows)
+
+    return (
+        current, 
+        future, 
+        current_plus_future, 
+        metadata["data_changes"], 
+        metadata["data_frequency"]
+        )
+
+
+def save_checked_long_data(
+        key: str,
+        df: pd.DataFrame,
+        series_bounds: pd.DataFrame,
+        data_changes: dict,
+        data_frequency: str,
+        ) -> None:
+
+    # The positions of each series are small enough to keep
+    # with the data rather than working them out again
+    cah.save_frame(
+        df = df, 
+        namespace = "uploads", 
+        key = key, 
+        metadata = {
+            "series_bounds": series_bounds.reset_index().to_dict(orient="list"),
+            "data_changes": data_changes,
+            "data_frequency": data_frequency,
+            }
+        )
+
+
+def load_checked_long_data(
+        key: str
+        ) -> Union[Tuple[pd.DataFrame, pd.DataFrame, dict, str], None]:
+    """
+    Load long format data which has already been through 
+    check_and_convert_long_data for the same upload and columns.
+
+    Returns None if it's not been cached.
+    """
+
+    cached = cah.load_frame(namespace = "uploads", key = key)
+
+    if cached is None:
+        return None
+    
+    df, metadata = cached
+
+    series_bounds = pd.DataFrame(metadata["series_bounds"])
+    series_bounds = series_bounds.set_index(series_bounds.columns[0])
+
+    return (
+        df, 
+        series_bounds, 
+        metadata["data_changes"], 
+        metadata["data_frequency"]
+        )
@@ -3,49 +3,77 @@
 
 import streamlit as st
 import pandas as pd
-import numpy as np
 from prophet import Prophet # type: ignore
 import datetime
 
-from typing import Tuple
+import backtest_helpers as bth
+import forecast_core as fc
+import job_helpers as jh
 
-import ga4py.add_tracker as add_tracker
+# These don't need the app, they live in forecast_core
+from forecast_core import (  # noqa: F401
+    model_dtypes,
+    seasonality_settings,
+    reverse_engineer_forecast_for_trend,
+)
 
+from typing import Tuple, Union
 
-def create_and_fit_prophet(
-        df: pd.DataFrame,
-        regressor_cols: list
-        ) -> Prophet:
-    
-    m = Prophet(seasonality_mode="multiplicative")
+import ga4py.add_tracker as add_tracker
 
-    # Add monthly seasonality
-    m.add_seasonality(name='monthly', period=30.5, fourier_order=5)
 
-    # Add in country holidays if selected
-    if st.session_state.holiday_country != "None":
-        m.add_country_holidays(country_name = st.session_state.holiday_country)
+def model_config(
+        regressor_cols: list,
+        data_frequency: str = "D",
+        ) -> fc.ModelConfig:
+    # The model settings the user picked in the app
+    return fc.ModelConfig(
+        regressor_cols = list(regressor_cols),
+        holiday_countries = list(st.session_state.holiday_countries),
+        use_log_scale = st.session_state.use_log_scale,
+        data_frequency = data_frequency,
+        )
 
 
-    # If the list is empty it shouldn't loop
-    for c in regressor_cols:
-        # All c should be present in dataframe
-        # because they had to be selected from the
-        # dropdown
-        m.add_regressor(c)
+def create_and_fit_prophet(
+        df: pd.DataFrame,
+        regressor_cols: list,
+        data_frequency: str = "D",
+        use_cache: bool = fc.MODEL_CACHE,
+        ) -> Prophet:
 
-    
-    # Log transform data to avoid predictions that go below 0
-    df_for_fit = df.copy(deep=True)
-    if st.session_state.use_log_scale:
-        df_for_fit["y"] = np.log(df_for_fit["y"])
+    return fc.fit_model(
+        df = df,
+        config = model_config(regressor_cols, data_frequency),
+        use_cache = use_cache,
+        )
 
-    m.fit(df_for_fit)
 
-    return m
+def load_fitted_prophet(
+        df: pd.DataFrame,
+        regressor_cols: list,
+        data_frequency: str = "D",
+        ) -> Union[Prophet, None]:
+    # Only if it's already been fitted (and cached)
+    if not fc.MODEL_CACHE:
+        return None
 
+    return fc.load_fitted_model(
+        df = df,
+        config = model_config(regressor_cols, data_frequency),
+        )
 
 
+def start_fitting_prophet(
+        df: pd.DataFrame,
+        regressor_cols: list,
+        data_frequency: str = "D",
+        ) -> jh.FitJob:
+    # Fit in the background, so the app doesn't freeze
+    return jh.FitJob(
+        df = df,
+        config = model_config(regressor_cols, data_frequency),
+        )
 
 
 def test_button_submit():
@@ -90,94 +118,79 @@ We will generate a forecast from {last_user_date_str} until {last_forecast_date_
 @add_tracker.analytics_hit_decorator
 def create_forecast(
         fitted_model: Prophet,
-        future_data: pd.DataFrame
+        future_data: pd.DataFrame,
+        interval_mode: str = "full",
         ):
     
+    return fc.predict(
+        fitted_model = fitted_model, 
+        future_data = future_data, 
+        interval_mode = interval_mode)
 
-    # Start by getting prophet's broken down prediction
-    forecast = fitted_model.predict(future_data)
-
-    return forecast
 
-def transform_forecast(
+def backtest_trend(
         df: pd.DataFrame,
-        columns_to_adjust: list[str]
+        regressor_cols: list,
+        horizon: int,
+        data_frequency: str = "D",
         ) -> pd.DataFrame:
-    
-    # Log transform predicted data (reversing earlier transform)
-    # Clip values at 0 to avoid any negatives
-    if st.session_state.use_log_scale:
-        for c in columns_to_adjust:
-            df[c] = np.exp(df[c])
-            df[c] = df[c].clip(lower = 0)
-        
-    return df
-
-
-def reverse_engineer_forecast_for_trend(
-        forecast_df: pd.DataFrame,
-        multiplier: float,
-        scale_bounds: bool,
-        ):
-    
-    """
-    For each day - calculate what the prediction would be if trend
-    for every future predicted day was exactly the same as the 
-    very first day. Calculate the difference between that and actual
-    and use that to be "100% trend applied".
-
-    Take multiplier and multiply the difference by that.
-
-    Then add the new difference onto yhat, yhat_upper, and yhat_lower.
+    # How well each trend strength would have forecast the history
+    return bth.backtest_multipliers(
+        df = df,
+        config = model_config(regressor_cols, data_frequency),
+        horizon = horizon,
+        )
 
-    This logic thanks to David Westby.
-    """
 
-    # # Get the multiplier columns
-    # components = ['daily', 'weekly', 'yearly', 'monthly', 'holidays']
-    # components = [comp for comp in components if comp in forecast_df.columns]
-
-    list_to_scale = [""]
-    list_to_manually_adjust = ["_lower", "_upper"]
+def forecast_is_cached(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        interval_mode: str,
+        ) -> bool:
 
-    if scale_bounds:
-        list_to_scale = ["", "_lower", "_upper"]
-        list_to_manually_adjust = []
+    return fc.PREDICTION_CACHE and fc.prediction_is_cached(
+        fitted_model = fitted_model,
+        future_data = future_data,
+        interval_mode = interval_mode)
 
 
-    for line in list_to_scale:
-        # Loop through standard, lower, and upper forecasts
+def add_intervals(
+        fitted_model: Prophet,
+        future_data: pd.DataFrame,
+        interval_mode: str,
+        ) -> pd.DataFrame:
+    # The same forecast as create_forecast (so it's not tracked again)
+    # but with the uncertainty intervals worked out
+    return fc.predict(
+        fitted_model = fitted_model, 
+        future_data = future_data, 
+        interval_mode = interval_mode)
+
+def trend_lookup(
+        forecast_df: pd.DataFrame,
+        scale_bounds: bool,
+        ) -> fc.TrendLookup:
 
-        first_trend_val = forecast_df[f"trend{line}"].iloc[0]
-        forecast_df[f"yhat{line}_fixed_trend"] = first_trend_val
-        forecast_df[f"yhat{line}_zero_trend"] = first_trend_val
+    return fc.trend_lookup(
+        forecast_df = forecast_df,
+        scale_bounds = scale_bounds,
+        use_log_scale = st.session_state.use_log_scale)
 
 
-        forecast_df[f"yhat{line}_zero_trend"] *= 1+ forecast_df[f"multiplicative_terms{line}"]
+def parse_trend_schedule(
+        text: str,
+        ramp: bool = True,
+        ) -> fc.TrendSchedule:
 
-        # Get the difference between new and original
-        # This is "100%" difference where actual is 100
-        # and no trend change is 0
-        forecast_df[f"{line}_trend_diff"] = forecast_df[f"yhat{line}"]-forecast_df[f"yhat{line}_zero_trend"]
+    return fc.parse_trend_schedule(text = text, ramp = ramp)
 
-        # Multiply that difference by the multiplier
-        forecast_df[f"{line}_trend_diff_to_use"] = forecast_df[f"{line}_trend_diff"]*multiplier
 
-        # Add that difference to get final adjusted value
-        # We can add because the number we're adding is multiplicative
-        # if our "constant trend" value is lower than actual we'll
-        # automatically subtract, if it's higher we'll automatically add on
-        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}_zero_trend"]+forecast_df[f"{line}_trend_diff_to_use"]
+def transform_forecast(
+        df: pd.DataFrame,
+        columns_to_adjust: list[str]
+        ) -> pd.DataFrame:
     
-    for line in list_to_manually_adjust:
-        # Loop through upper and lower lines if appropriate
-
-        # Recalculate difference based on difference between original and new yhat
-        yhat_diff = forecast_df[f"yhat_adjusted"]-forecast_df["yhat"]
-
-        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}"]-yhat_diff
-
-        # Adjust to make sure that is 0 at minimum
-        forecast_df[f"yhat{line}_adjusted"] = forecast_df[f"yhat{line}_adjusted"].clip(lower = 0)
-
-    return forecast_df
\ No newline at end of file
+    return fc.untransform_forecast(
+        df = df, 
+        columns_to_adjust = columns_to_adjust, 
+        use_log_scale = st.session_state.use_log_scale)
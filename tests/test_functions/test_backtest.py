@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+import pandas as pd
+import backtest_helpers as bth
+import forecast_core as fc
+
+
+class testBacktest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file = pd.read_csv("tests/test_files/example_wp_log_peyton_manning.csv", parse_dates=["ds"]).iloc[:500]
+
+        return super().setUp()
+
+    def test_choose_cutoffs(self) -> None:
+
+        cutoffs = bth.choose_cutoffs(rows = 500, horizon = 30, n_cutoffs = 3)
+
+        self.assertEqual(cutoffs, [440, 455, 470])
+
+        # Cutoffs without enough history before them are dropped
+        self.assertEqual(bth.choose_cutoffs(rows = 130, horizon = 30, n_cutoffs = 3), [100])
+
+        with self.assertRaises(ValueError):
+            bth.choose_cutoffs(rows = 100, horizon = 30)
+
+    def test_backtest_multipliers(self) -> None:
+
+        config = fc.ModelConfig()
+        forecasts = bth.run_backtest(df = self.file, config = config, horizon = 30, n_cutoffs = 2, workers = 1, use_cache = False)
+
+        self.assertEqual(len(forecasts), 2)
+        self.assertEqual(len(forecasts[0]), 30)
+
+        scores = bth.score_multipliers(cutoff_forecasts = forecasts, use_log_scale = False)
+
+        self.assertEqual(scores["multiplier"].tolist(), bth.MULTIPLIERS)
+        self.assertIn(bth.best_multiplier(scores), bth.MULTIPLIERS)
+
+        # With the full trend it's just the forecast's own error
+        actual = np.concatenate([f["y"] for f in forecasts])
+        yhat = np.concatenate([f["yhat"] for f in forecasts])
+        self.assertAlmostEqual(scores["mae"].iloc[-1], np.abs(yhat - actual).mean())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+import batch_forecast as bf
+import forecast_core as fc
+
+
+def _worker_dies(path, settings):
+    # Stands in for forecast_file when the worker is killed (i.e. out of memory)
+    os._exit(1)
+
+
+class testBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+        self.settings = bf.BatchSettings(
+            data_config = fc.DataConfig(date_col = "ds", target_col = "y"),
+            holiday_countries = [],
+            use_log_scale = False,
+            multiplier = 0.5,
+            scale_bounds = True,
+            output_dir = self.temp_dir.name,
+            use_cache = False,
+        )
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+        return super().tearDown()
+
+    def test_find_files(self) -> None:
+
+        from_dir = bf.find_files(["tests/test_files"])
+        from_glob = bf.find_files(["tests/test_files/*.csv"])
+
+        self.assertEqual(from_dir, from_glob)
+        self.assertIn(os.path.join("tests/test_files", "example_data_2.csv"), from_dir)
+
+    def test_forecast_file(self) -> None:
+
+        result = bf.forecast_file("tests/test_files/example_wp_log_peyton_manning.csv", self.settings)
+
+        self.assertIsNone(result.error)
+        assert result.output_path is not None
+        self.assertTrue(os.path.exists(result.output_path))
+
+        # Problems should be returned, not raised
+        result = bf.forecast_file("tests/test_files/example_data_2.csv", self.settings)
+
+        self.assertIsNotNone(result.error)
+        self.assertIsNone(result.output_path)
+
+    def test_output_clashes(self) -> None:
+
+        paths = [os.path.join("a", "sales.csv"), os.path.join("b", "sales.csv"), os.path.join("a", "visits.csv")]
+
+        self.assertEqual(bf.output_clashes(paths), {"sales_forecast.csv": paths[:2]})
+        self.assertEqual(bf.output_clashes(paths[1:]), {})
+
+        # The batch shouldn't start if two files would overwrite each other
+        for folder in ["a", "b"]:
+            os.makedirs(os.path.join(self.temp_dir.name, folder))
+            open(os.path.join(self.temp_dir.name, folder, "sales.csv"), "w").close()
+
+        self.assertEqual(bf.main([
+            os.path.join(self.temp_dir.name, "a"),
+            os.path.join(self.temp_dir.name, "b"),
+            "--date-col", "ds",
+            "--target-col", "y",
+            "--output-dir", self.temp_dir.name]), 1)
+
+        # And a batch that took no time shouldn't divide by zero
+        bf.print_summary([bf.FileResult(path = "sales.csv")], seconds = 0)
+
+    def test_worker_dies(self) -> None:
+
+        forecast_file = bf.forecast_file
+        bf.forecast_file = _worker_dies
+        try:
+            results = bf.run_batch(paths = ["sales.csv"], settings = self.settings, workers = 1)
+        finally:
+            bf.forecast_file = forecast_file
+
+        # Reported like any other failed file, rather than stopping the batch
+        self.assertEqual(len(results), 1)
+        self.assertIn("BrokenProcessPool", results[0].error)
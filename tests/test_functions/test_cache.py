@@ -0,0 +1,84 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+import cache_helpers as cah
+
+
+class testCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+
+        self.file = pd.read_csv(
+            "tests/test_files/example_wp_log_peyton_manning.csv",
+            parse_dates = ["ds"]
+        )
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+        return super().tearDown()
+
+    def test_hash_key(self) -> None:
+
+        # Same parts should give the same key
+        self.assertEqual(
+            cah.hash_key(b"abc", "ds", ["regressor_1"]),
+            cah.hash_key(b"abc", "ds", ["regressor_1"]))
+
+        # Moving data between parts should change the key
+        self.assertNotEqual(cah.hash_key("ab", "c"), cah.hash_key("a", "bc"))
+
+        # File hashes should match for paths and open files
+        path = "tests/test_files/example_data_2.csv"
+        with open(path, "rb") as f:
+            self.assertEqual(cah.hash_file(path), cah.hash_file(f))
+
+    def test_save_and_load(self) -> None:
+
+        self.assertIsNone(cah.load_frame("uploads", "missing", cache_dir = self.cache_dir))
+
+        cah.save_frame(
+            df = self.file, 
+            namespace = "uploads", 
+            key = "peyton", 
+            metadata = {"current_rows": 10},
+            cache_dir = self.cache_dir)
+        
+        loaded = cah.load_frame("uploads", "peyton", cache_dir = self.cache_dir)
+        assert loaded is not None
+        loaded_df, metadata = loaded
+
+        self.assertTrue(loaded_df.equals(self.file))
+        self.assertEqual(metadata, {"current_rows": 10})
+
+        # Anything else can be cached as bytes
+        self.assertIsNone(cah.load_bytes("models", "missing", cache_dir = self.cache_dir))
+        cah.save_bytes(b"{}", "models", "model", suffix = ".json", cache_dir = self.cache_dir)
+        self.assertEqual(
+            cah.load_bytes("models", "model", suffix = ".json", cache_dir = self.cache_dir), 
+            b"{}")
+
+    def test_eviction(self) -> None:
+
+        for i in range(3):
+            cah.save_frame(
+                df = self.file, 
+                namespace = "uploads", 
+                key = f"file_{i}", 
+                cache_dir = self.cache_dir)
+            
+            # Make sure each file looks older than the last
+            path = cah.cache_path("uploads", f"file_{i}", ".parquet", self.cache_dir)
+            os.utime(path, (i, i))
+
+        # Reading a file should mark it as recently used
+        cah.load_frame("uploads", "file_0", cache_dir = self.cache_dir)
+
+        file_size = os.path.getsize(path)
+        cah.evict_cache(max_bytes = file_size * 2, cache_dir = self.cache_dir)
+
+        remaining = sorted(os.listdir(os.path.join(self.cache_dir, "uploads")))
+        self.assertEqual(remaining, ["file_0.parquet", "file_2.parquet"])
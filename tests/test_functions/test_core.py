@@ -0,0 +1,185 @@
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+import cache_helpers as cah
+import forecast_core as fc
+
+
+class testCore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file = pd.read_csv("tests/test_files/example_wp_log_peyton_manning.csv")
+        self.reordered_file = pd.read_csv("tests/test_files/example_wp_log_peyton_manning_reordered.csv")
+
+        self.config = fc.DataConfig(date_col = "ds", target_col = "y")
+
+        self.cache_dir = cah.CACHE_DIR
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        cah.CACHE_DIR = self.cache_dir
+        return super().tearDown()
+
+    def test_check_data(self) -> None:
+
+        checked = fc.check_data(df = self.file, config = self.config)
+
+        # No blank rows so we should have generated daily future rows
+        self.assertEqual(checked.data_frequency, "D")
+        self.assertEqual(len(checked.current), len(self.file))
+        self.assertEqual(len(checked.future), 1096)
+        self.assertFalse(checked.data_changes["reordered"])
+
+        # Without permission to reorder the data we should stop
+        self.config.reorder = False
+        self.assertRaises(ValueError, fc.check_data, df = self.reordered_file, config = self.config)
+
+        self.config.reorder = True
+        checked = fc.check_data(df = self.reordered_file, config = self.config)
+        self.assertTrue(checked.data_changes["reordered"])
+        self.assertTrue(checked.current["ds"].is_monotonic_increasing)
+
+    def test_forecast(self) -> None:
+
+        checked = fc.check_data(df = self.file.iloc[:400], config = self.config)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cah.CACHE_DIR = cache_dir
+
+            model_config = fc.ModelConfig(data_frequency = checked.data_frequency)
+            forecast = fc.forecast(checked = checked, config = model_config)
+
+            # The second time should come from the cache
+            cached_forecast = fc.forecast(checked = checked, config = model_config)
+
+            # The model's fingerprint is its cache key, whether it was just fitted or loaded
+            cache_key = fc.model_cache_key(df = checked.current, config = model_config)
+            self.assertEqual(fc.model_fingerprint(fc.fit_model(df = checked.current, config = model_config)), cache_key)
+            self.assertEqual(fc.model_fingerprint(fc.load_fitted_model(df = checked.current, config = model_config)), cache_key)
+
+        self.assertEqual(len(forecast), len(checked.future))
+        self.assertTrue(np.allclose(forecast["yhat"], cached_forecast["yhat"]))
+
+        # The intervals are simulated, so they'd only match exactly if
+        # the prediction came from the cache rather than predicting again
+        self.assertTrue((forecast["yhat_lower"] == cached_forecast["yhat_lower"]).all())
+
+        # Without intervals the bounds should just be the forecast
+        model = fc.fit_model(df = checked.current, config = model_config, use_cache = False)
+        point_forecast = fc.predict(fitted_model = model, future_data = checked.future, interval_mode = "none", use_cache = False)
+
+        self.assertTrue(np.allclose(point_forecast["yhat"], forecast["yhat"]))
+        self.assertTrue((point_forecast["yhat_lower"] == point_forecast["yhat"]).all())
+        self.assertEqual(model.uncertainty_samples, fc.INTERVAL_MODES["full"])
+
+        # The lean prediction should match Prophet's, with just the columns we use
+        full_forecast = fc.predict(fitted_model = model, future_data = checked.future, interval_mode = "none", use_cache = False, lean = False)
+
+        self.assertEqual(list(point_forecast.columns), fc.LEAN_COLUMNS)
+        for c in fc.LEAN_COLUMNS[1:]:
+            self.assertTrue(np.allclose(point_forecast[c], full_forecast[c]))
+
+    def test_warm_start(self) -> None:
+
+        checked = fc.check_data(df = self.file.iloc[:430], config = self.config)
+        model_config = fc.ModelConfig(data_frequency = checked.data_frequency)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cah.CACHE_DIR = cache_dir
+
+            # Last month's model, fitted to the first part of the data
+            fc.fit_model(df = checked.current.iloc[:400], config = model_config)
+
+            previous = fc.find_previous_fit(
+                row_hashes = fc._row_hashes(checked.current, model_config),
+                config_key = fc._config_key(model_config))
+            self.assertIsNotNone(previous)
+
+            warm = fc.fit_model(df = checked.current, config = model_config)
+
+        cold = fc.fit_model(df = checked.current, config = model_config, use_cache = False)
+
+        # Starting from the old model should get (almost) the same fit
+        warm_yhat = warm.predict(checked.current)["yhat"]
+        cold_yhat = cold.predict(checked.current)["yhat"]
+        self.assertTrue(np.allclose(warm_yhat, cold_yhat, rtol = 0.02))
+
+    def test_trend_lookup(self) -> None:
+
+        checked = fc.check_data(df = self.file.iloc[:400], config = self.config)
+        model_config = fc.ModelConfig(data_frequency = checked.data_frequency)
+
+        model = fc.fit_model(df = checked.current, config = model_config, use_cache = False)
+        forecast = fc.predict(fitted_model = model, future_data = checked.future, interval_mode = "reduced", use_cache = False)
+
+        multipliers = [0, 0.35, 1]
+
+        for scale_bounds in [True, False]:
+            for use_log_scale in [True, False]:
+                lookup = fc.trend_lookup(forecast_df = forecast, scale_bounds = scale_bounds, use_log_scale = use_log_scale)
+                all_adjusted = lookup.all_adjusted(multipliers)
+
+                # The same as going through the dataframe for each multiplier
+                for i, multiplier in enumerate(multipliers):
+                    adjusted = fc.adjust_forecast(
+                        forecast_df = forecast, 
+                        multiplier = multiplier, 
+                        scale_bounds = scale_bounds, 
+                        use_log_scale = use_log_scale)
+                    expected = adjusted[fc.ADJUSTED_COLUMNS].to_numpy().T
+
+                    self.assertTrue(np.allclose(lookup.adjusted(multiplier), expected))
+                    self.assertTrue(np.allclose(all_adjusted[i], expected))
+
+                    # And the same as the adjusted columns, then undoing the log
+                    reverse_engineered = pd.DataFrame(fc.reverse_engineer_forecast_for_trend(
+                        forecast_df = forecast, 
+                        multiplier = multiplier, 
+                        scale_bounds = scale_bounds))
+                    columns = [f"{c}_adjusted" for c in fc.ADJUSTED_COLUMNS]
+                    untransformed = fc.untransform_forecast(df = reverse_engineered, columns_to_adjust = columns, use_log_scale = use_log_scale)
+                    self.assertTrue(np.allclose(untransformed[columns].to_numpy().T, expected))
+
+                    # Filling an array that's passed in
+                    out = np.empty_like(lookup.base)
+                    self.assertIs(lookup.adjusted(multiplier, out = out), out)
+                    self.assertTrue(np.allclose(out, expected))
+
+    def test_trend_schedule(self) -> None:
+
+        dates = pd.Series(pd.date_range("2024-01-01", periods = 1200, freq = "D"))
+
+        schedule = fc.parse_trend_schedule("0:100, 90:100, 1095:40%")
+        ramp = schedule.multipliers(dates)
+
+        self.assertEqual(ramp[90], 1)
+        self.assertAlmostEqual(ramp[1095], 0.4)
+        self.assertEqual(ramp[-1], 0.4)
+        self.assertTrue(0.4 < ramp[500] < 1)
+
+        steps = fc.TrendSchedule(points = schedule.points, ramp = False).multipliers(dates)
+
+        self.assertEqual(steps[1094], 1)
+        self.assertAlmostEqual(steps[1095], 0.4)
+
+        with self.assertRaises(ValueError):
+            fc.parse_trend_schedule("0-100")
+
+        # Each row gets the same adjustment as if its multiplier was used for the whole forecast
+        checked = fc.check_data(df = self.file.iloc[:400], config = self.config)
+        model_config = fc.ModelConfig(data_frequency = checked.data_frequency)
+
+        model = fc.fit_model(df = checked.current, config = model_config, use_cache = False)
+        forecast = fc.predict(fitted_model = model, future_data = checked.future, interval_mode = "none", use_cache = False)
+
+        multipliers = fc.TrendSchedule(points = [(0, 1), (len(forecast) - 1, 0)]).multipliers(forecast["ds"])
+        scheduled = fc.adjust_forecast(forecast_df = forecast, multiplier = multipliers, scale_bounds = False, use_log_scale = False)
+        lookup = fc.trend_lookup(forecast_df = forecast, scale_bounds = False, use_log_scale = False)
+
+        for row in [0, len(forecast) // 2, len(forecast) - 1]:
+            fixed = fc.adjust_forecast(forecast_df = forecast, multiplier = multipliers[row], scale_bounds = False, use_log_scale = False)
+            self.assertAlmostEqual(scheduled["yhat"].iloc[row], fixed["yhat"].iloc[row])
+            self.assertAlmostEqual(scheduled["yhat_lower"].iloc[row], fixed["yhat_lower"].iloc[row])
+
+        self.assertTrue(np.allclose(lookup.adjusted(multipliers), scheduled[fc.ADJUSTED_COLUMNS].to_numpy().T))
@@ -0,0 +1,93 @@
+import unittest
+import pandas as pd
+import date_helpers as dh
+
+
+class testDates(unittest.TestCase):
+    def setUp(self) -> None:
+
+        self.file_full = pd.read_csv(
+            "tests/test_files/example_wp_log_peyton_manning.csv"
+        )
+
+        # Same data with DD/MM/YYYY dates
+        self.file_regional = pd.read_csv(
+            "tests/test_files/peyton_manning_broken_dates.csv"
+        )
+
+        return super().setUp()
+
+    def test_regional_dates(self) -> None:
+
+        iso_dates, iso_failed, iso_format = dh.parse_dates(self.file_full["ds"])
+        regional_dates, regional_failed, regional_format = dh.parse_dates(self.file_regional["ds"])
+
+        self.assertIsNone(iso_failed)
+        self.assertIsNone(regional_failed)
+        self.assertEqual(iso_format, "%Y-%m-%d")
+        self.assertEqual(regional_format, "%d/%m/%Y")
+        self.assertTrue(iso_dates.equals(regional_dates))
+
+    def test_month_first_dates(self) -> None:
+
+        # Ambiguous until we get past the 12th of the month
+        dates = pd.Series(["01/02/2023", "01/03/2023", "01/13/2023", "01/14/2023"])
+
+        parsed, first_failed_row, date_format = dh.parse_dates(dates)
+
+        self.assertIsNone(first_failed_row)
+        self.assertEqual(date_format, "%m/%d/%Y")
+        self.assertEqual(parsed.iloc[2], pd.Timestamp("2023-01-13"))
+
+    def test_repeated_and_blank_dates(self) -> None:
+
+        # Long format files repeat the same dates
+        dates = pd.Series(["2023-01-01T00:00:00", None, "2023-01-01T00:00:00", "2023-01-02T12:30:00"])
+
+        parsed, first_failed_row, _ = dh.parse_dates(dates)
+
+        self.assertIsNone(first_failed_row)
+        self.assertTrue(pd.isna(parsed.iloc[1]))
+        self.assertEqual(parsed.iloc[2], pd.Timestamp("2023-01-01"))
+        self.assertEqual(parsed.iloc[3], pd.Timestamp("2023-01-02 12:30"))
+
+    def test_first_failed_row(self) -> None:
+
+        dates = pd.Series(["2023-01-01", "2023-01-02", "not a date", "2023-01-04", "also not a date"])
+
+        parsed, first_failed_row, _ = dh.parse_dates(dates)
+
+        self.assertEqual(first_failed_row, 2)
+        self.assertEqual(parsed.iloc[3], pd.Timestamp("2023-01-04"))
+
+    def test_infer_frequency(self) -> None:
+
+        daily = pd.Series(pd.date_range("2023-01-01", periods=100, freq="D"))
+        hourly = pd.Series(pd.date_range("2023-01-01", periods=100, freq="H"))
+        weekly = pd.Series(pd.date_range("2023-01-02", periods=100, freq="W-MON"))
+        monthly = pd.Series(pd.date_range("2023-01-31", periods=24, freq="M"))
+
+        self.assertEqual(dh.infer_frequency(daily), "D")
+        self.assertEqual(dh.infer_frequency(hourly), "H")
+        self.assertEqual(dh.infer_frequency(weekly), "W-MON")
+        self.assertEqual(dh.infer_frequency(monthly), "MS")
+
+        # A missing day here and there shouldn't change anything
+        self.assertEqual(dh.infer_frequency(daily.drop([5, 50])), "D")
+
+        # Lots of weekly series on the same dates are still weekly
+        many_weekly = pd.concat([weekly] * 10, ignore_index=True)
+        series = pd.Series(range(10)).repeat(100).reset_index(drop=True)
+        self.assertEqual(dh.infer_frequency(many_weekly, series=series), "W-MON")
+
+    def test_future_dates(self) -> None:
+
+        weekly_dates = dh.future_dates(pd.Timestamp("2023-01-02"), "W-MON", dh.forecast_periods("W-MON"))
+        self.assertEqual(len(weekly_dates), 157)
+        self.assertEqual(weekly_dates[0], pd.Timestamp("2023-01-09"))
+
+        # Month end data should stay at the end of the month
+        monthly_dates = dh.future_dates(pd.Timestamp("2023-01-31"), "MS", 3)
+        self.assertEqual(
+            list(monthly_dates), 
+            [pd.Timestamp("2023-02-28"), pd.Timestamp("2023-03-31"), pd.Timestamp("2023-04-30")])
@@ -9,51 +9,67 @@ class testPandas(unittest.TestCase):
 
     def test_reverse_engineer_forecast(self):
         forecast_df = self.file
+        original_df = forecast_df.copy()
         multiplier = 1
 
 
 
-        returned_df = pf.reverse_engineer_forecast_for_trend(
+        returned = pf.reverse_engineer_forecast_for_trend(
                 forecast_df = forecast_df,
                 multiplier = multiplier,
+                scale_bounds = True,
+                debug = True,
                 )
 
         # When the multiplier is 1 there should be no change
-        self.assertAlmostEqual(returned_df["yhat"].sum(), returned_df["yhat_adjusted"].sum())
+        self.assertAlmostEqual(forecast_df["yhat"].sum(), returned["yhat_adjusted"].sum())
+
+        # The forecast itself shouldn't be changed
+        pd.testing.assert_frame_equal(forecast_df, original_df)
 
 
         # When the multiplier is 0 then "yhat_adjusted" should match "yhat_zero_trend"
         multiplier = 0
 
-        returned_df = pf.reverse_engineer_forecast_for_trend(
+        returned = pf.reverse_engineer_forecast_for_trend(
                 forecast_df = forecast_df,
                 multiplier = multiplier,
+                scale_bounds = True,
+                debug = True,
                 )
 
         # When the multiplier is 1 there should be no change
-        self.assertAlmostEqual(returned_df["yhat_zero_trend"].sum(), returned_df["yhat_adjusted"].sum())
+        self.assertAlmostEqual(returned["yhat_zero_trend"].sum(), returned["yhat_adjusted"].sum())
 
         # Whern the multiplier is 0.5 the adjusted value should be half way
         # between the standard value and the zero trend value
         # The same goes for any proportional value of our multiplier
         for multiplier in range(0, 11, 1):
             multiplier = multiplier/10
-            returned_df = pf.reverse_engineer_forecast_for_trend(
+            returned = pf.reverse_engineer_forecast_for_trend(
                     forecast_df = forecast_df,
                     multiplier = multiplier,
+                    scale_bounds = True,
+                    debug = True,
                     )
             
-            base_forecast_total = returned_df["yhat"].sum()
-            zero_trend_forecast_total = returned_df["yhat_zero_trend"].sum()
-            adjusted_forecast_total = returned_df["yhat_adjusted"].sum()
+            base_forecast_total = forecast_df["yhat"].sum()
+            zero_trend_forecast_total = returned["yhat_zero_trend"].sum()
+            adjusted_forecast_total = returned["yhat_adjusted"].sum()
 
             difference = base_forecast_total-zero_trend_forecast_total
             part_way = zero_trend_forecast_total+(difference*multiplier)
             
             self.assertAlmostEqual(adjusted_forecast_total, part_way)
 
-            print(f"Multiplier '{multiplier}' sucess. Total = {adjusted_forecast_total}")
+        # Without scaling the bounds they move as much as yhat does
+        returned = pf.reverse_engineer_forecast_for_trend(
+                forecast_df = forecast_df,
+                multiplier = 0.5,
+                scale_bounds = False,
+                )
 
-            import pdb
-            pdb.set_trace()
-            
\ No newline at end of file
+        self.assertEqual(sorted(returned), ["yhat_adjusted", "yhat_lower_adjusted", "yhat_upper_adjusted"])
+        yhat_diff = returned["yhat_adjusted"] - forecast_df["yhat"]
+        expected_upper = (forecast_df["yhat_upper"] - yhat_diff).clip(lower = 0)
+        self.assertAlmostEqual(returned["yhat_upper_adjusted"].sum(), expected_upper.sum())
@@ -0,0 +1,63 @@
+import unittest
+import pandas as pd
+import handle_holiday_list as hh
+import forecast_core as fc
+
+
+class testHolidays(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dates = pd.Series(pd.date_range("2020-03-01", "2021-06-30", freq="D"))
+
+        return super().setUp()
+
+    def test_available_countries(self) -> None:
+
+        countries = hh.return_available_countries()
+
+        self.assertEqual(countries[0], "None")
+        self.assertIn("GB", countries)
+
+        # Served from memory after the first call
+        self.assertIs(hh.supported_countries(), hh.supported_countries())
+
+    def test_holidays_frame(self) -> None:
+
+        gb = hh.holidays_frame(countries = ["GB"], dates = self.dates)
+
+        # Covers the data and the years we might forecast
+        self.assertEqual(gb["ds"].min().year, 2020)
+        self.assertEqual(gb["ds"].max().year, 2021 + hh.YEARS_AHEAD)
+
+        # The same table is reused rather than rebuilt, but we get a copy of it
+        cached = hh.country_holidays("GB", 2020, 2021 + hh.YEARS_AHEAD)
+        self.assertIs(cached, hh.country_holidays("GB", 2020, 2021 + hh.YEARS_AHEAD))
+        self.assertIsNot(gb, cached)
+        self.assertTrue(gb.equals(cached))
+
+        both = hh.holidays_frame(countries = ["GB", "US"], dates = self.dates)
+        us = hh.holidays_frame(countries = ["US"], dates = self.dates)
+
+        # New Year's Day is in both but only appears once
+        self.assertFalse(both.duplicated(subset=["ds", "holiday"]).any())
+        self.assertLess(len(both), len(gb) + len(us))
+
+    def test_build_model(self) -> None:
+
+        config = fc.ModelConfig(holiday_countries = ["GB", "US"])
+        m = fc.build_model(config, dates = self.dates)
+
+        self.assertIsNotNone(m.holidays)
+        self.assertIsNone(m.country_holidays)
+
+        # Prophet changes the holidays it's given, which shouldn't reach the cache
+        cached = hh.country_holidays("GB", 2020, 2021 + hh.YEARS_AHEAD)
+        m = fc.build_model(fc.ModelConfig(holiday_countries = ["GB"]), dates = self.dates)
+        self.assertIsNot(m.holidays, cached)
+
+        # Holidays need the dates to know which years to cover
+        with self.assertRaises(ValueError):
+            fc.build_model(config)
+
+
+if __name__ == '__main__':
+    unittest.main()
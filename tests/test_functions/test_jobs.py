@@ -0,0 +1,52 @@
+import unittest
+import time
+import pandas as pd
+import forecast_core as fc
+import job_helpers as jh
+
+
+class testJobs(unittest.TestCase):
+    def setUp(self) -> None:
+        self.file = pd.read_csv(
+            "tests/test_files/example_wp_log_peyton_manning.csv",
+            parse_dates = ["ds"]
+        ).iloc[:400]
+
+        return super().setUp()
+
+    def wait_for(self, job: jh.FitJob, timeout: float = 120) -> str:
+        while job.poll() == "running" and job.elapsed < timeout:
+            time.sleep(0.1)
+        return job.status
+
+    def test_fit_job(self) -> None:
+
+        job = jh.FitJob(df = self.file, config = fc.ModelConfig(), use_cache = False)
+
+        self.assertEqual(self.wait_for(job), "done")
+        self.assertEqual(len(job.result().predict(self.file)), len(self.file))
+
+    def test_cancel_job(self) -> None:
+
+        job = jh.FitJob(df = self.file, config = fc.ModelConfig(), use_cache = False)
+        job.cancel()
+
+        self.assertEqual(job.poll(), "cancelled")
+        self.assertRaises(ValueError, job.result)
+
+    def test_failed_job(self) -> None:
+
+        # Prophet needs at least two rows
+        job = jh.FitJob(df = self.file.iloc[:1], config = fc.ModelConfig(), use_cache = False)
+
+        self.assertEqual(self.wait_for(job), "failed")
+        self.assertIn("ValueError", job.error)
+
+    def test_dead_job(self) -> None:
+
+        # i.e. the process was killed for running out of memory
+        job = jh.FitJob(df = self.file, config = fc.ModelConfig(), use_cache = False)
+        job._process.terminate()
+
+        self.assertEqual(self.wait_for(job), "failed")
+        self.assertIn("unexpectedly", job.error)
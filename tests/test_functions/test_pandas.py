@@ -1,7 +1,9 @@
 import unittest
 import pandas_helpers as pdh
 import pandas as pd
+import numpy as np
 import os
+import io
 
 class testPandas(unittest.TestCase):
     def setUp(self) -> None:
@@ -47,6 +49,275 @@ class testPandas(unittest.TestCase):
 
         self.assertRaises(ValueError, pdh.check_and_convert_data, **arguments)
         
+    def test_data_blocks(self) -> None:
+
+        converted_file: pd.DataFrame = pdh.date_col_conversion(
+            df = self.file_with_missing, 
+            date_col = self.date_col)
+
+        # The first gap should be reported along with the
+        # count of the empty dates before it
+        with self.assertRaisesRegex(ValueError, "missing values for 5 \n"):
+            pdh.check_for_data_blocks(
+                df = converted_file,
+                target_column = "y",
+                date_column = "raw_date",
+                regressor_column_list = []
+            )
+
+        # Blank rows at the end are our forecast window
+        regressor_file = pd.read_csv(
+            "tests/test_files/example_data_2_with_regressor.csv"
+        )
+        converted_file = pdh.date_col_conversion(
+            df = regressor_file, 
+            date_col = self.date_col)
+
+        forecast_start = pdh.check_for_data_blocks(
+            df = converted_file,
+            target_column = "sessions",
+            date_column = "raw_date",
+            regressor_column_list = ["regressor_1"]
+        )
+
+        self.assertEqual(len(converted_file) - forecast_start, converted_file["sessions"].isna().sum())
+        self.assertEqual(converted_file["raw_date"].iloc[forecast_start], pd.Timestamp("2023-10-17"))
+
+        # Current and future should share memory with the checked data
+        current, future = pdh.split_at_boundary(converted_file, forecast_start)
+        self.assertEqual(len(current) + len(future), len(converted_file))
+        self.assertTrue(np.shares_memory(future["sessions"].to_numpy(), converted_file["sessions"].to_numpy()))
+
+    def test_chunked_reading(self) -> None:
+
+        # Reading in small chunks should give the same data 
+        # as reading all at once
+        chunked_file = pdh.read_csv_in_chunks(
+            file = "tests/test_files/example_data_2_with_regressor.csv",
+            date_col = "ds",
+            numeric_cols = ["sessions", "regressor_1"],
+            chunksize = 50
+        )
+
+        full_file = pd.read_csv("tests/test_files/example_data_2_with_regressor.csv")
+
+        self.assertEqual(len(chunked_file), len(full_file))
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(chunked_file["ds"]))
+        self.assertTrue(chunked_file["sessions"].equals(full_file["sessions"].astype(float)))
+
+        # Dates we can't read should stop the read, and tell
+        # the user which row was the problem
+        broken_file = io.StringIO(
+            "ds,y\n" 
+            + "".join(f"2023-01-{day:02},1\n" for day in range(1, 31))
+            + "not a date,1\n")
+        
+        with self.assertRaisesRegex(ValueError, "at row 30"):
+            pdh.read_csv_in_chunks(
+                file = broken_file,
+                date_col = "ds",
+                numeric_cols = ["y"],
+                chunksize = 20)
+
+        # If the first chunk's days only go up to 12 the day/month order
+        # is a guess, later chunks which show it's wrong should still read
+        month_first_file = io.StringIO(
+            "ds,series,y\n"
+            + "".join(f"01/{day:02}/2023,a,1\n" for day in range(1, 13))
+            + "".join(f"01/{day:02}/2023,b,1\n" for day in range(1, 32)))
+
+        month_first = pdh.read_csv_in_chunks(
+            file = month_first_file,
+            date_col = "ds",
+            numeric_cols = ["y"],
+            chunksize = 12,
+            series_col = "series")
+
+        self.assertEqual(len(month_first), 43)
+        self.assertTrue((month_first["ds"].dt.month == 1).all())
+        self.assertEqual(month_first["ds"].iloc[11], pd.Timestamp("2023-01-12"))
+
+        # Duplicate column names should be caught from the header
+        header = pdh.read_csv_header("tests/test_files/peyton_manning_duplicate_columns.csv")
+        self.assertRaises(ValueError, pdh.check_columns, header)
+
+    def test_columns_to_numbers(self) -> None:
+
+        df = pd.DataFrame({
+            "sessions": ["1,234", "£5.50", None, "15%", "(300)"],
+            "regressor_1": [1, 0, 1, 0, 1],
+        })
+
+        pdh.columns_to_numbers(
+            df = df, 
+            column_names = {"sessions": "sessions", "regressor_1": "regressor_1"})
+
+        self.assertEqual(df["sessions"].tolist()[:2], [1234, 5.5])
+        self.assertTrue(pd.isna(df["sessions"].iloc[2]))
+        self.assertEqual(df["sessions"].tolist()[3:], [15, -300])
+        self.assertEqual(df["regressor_1"].dtype, float)
+
+        # Cells we can't read should be listed in the error
+        df = pd.DataFrame({"y": ["1", "2", "three"], "regressor_1": ["1", "one", "1"]})
+        with self.assertRaisesRegex(ValueError, "row 2 of 'target': 'three'"):
+            pdh.columns_to_numbers(
+                df = df, 
+                column_names = {"y": "target", "regressor_1": "regressor_1"})
+
+    def test_duplicate_dates(self) -> None:
+
+        df = pd.DataFrame({
+            "ds": ["2023-01-03", "2023-01-01", "2023-01-02", "2023-01-01", "2023-01-04", "2023-01-04"],
+            "sessions": [3, 1, 2, 10, None, None],
+            "regressor_1": [0, 1, 0, 1, 1, 1],
+        })
+
+        converted_file = pdh.date_col_conversion(df = df, date_col = "ds")
+
+        self.assertEqual(pdh.find_date_issues(converted_file["ds"]), (False, 2))
+
+        sorted_file = pdh.sort_by_date(converted_file)
+        self.assertEqual(pdh.find_date_issues(sorted_file["ds"]), (True, 2))
+
+        # Rows with the same date should keep their uploaded order
+        self.assertEqual(sorted_file["sessions"].tolist()[:2], [1, 10])
+
+        # Without a way to combine them, duplicates should raise an error
+        self.assertRaises(
+            ValueError, 
+            pdh.check_duplicate_dates, 
+            df = sorted_file, 
+            value_cols = ["sessions", "regressor_1"], 
+            duplicate_dates = None)
+
+        combined, rows_combined = pdh.check_duplicate_dates(
+            df = sorted_file, 
+            value_cols = ["sessions", "regressor_1"], 
+            duplicate_dates = "sum")
+
+        self.assertEqual(rows_combined, 2)
+        self.assertEqual(combined["sessions"].tolist()[:3], [11, 2, 3])
+        self.assertEqual(combined["regressor_1"].tolist(), [2, 0, 0, 2])
+
+        # Blank future rows should stay blank
+        self.assertTrue(pd.isna(combined["sessions"].iloc[3]))
+        self.assertEqual(list(combined.columns), list(sorted_file.columns))
+
+        # A row with a value but no date shouldn't disappear when the dates are combined
+        blank_date = pd.concat([df, pd.DataFrame({"ds": [None], "sessions": [99], "regressor_1": [0]})], ignore_index=True)
+        sorted_blank_date = pdh.sort_by_date(pdh.date_col_conversion(df = blank_date, date_col = "ds"))
+
+        for how in ["sum", "mean"]:
+            combined, _ = pdh.check_duplicate_dates(
+                df = sorted_blank_date, 
+                value_cols = ["sessions", "regressor_1"], 
+                duplicate_dates = how)
+
+            self.assertIn(99, combined["sessions"].tolist())
+            with self.assertRaisesRegex(ValueError, "doesn't have a value\nin the date column"):
+                pdh.check_for_data_blocks(
+                    df = combined,
+                    target_column = "sessions",
+                    date_column = "raw_date",
+                    regressor_column_list = ["regressor_1"])
+
+    def test_long_format_blocks(self) -> None:
+
+        df = pd.DataFrame({
+            "ds": ["2023-01-02", "2023-01-01", "2023-01-01", "2023-01-02", "2023-01-03", "2023-01-03"],
+            "series": ["b", "b", "a", "a", "a", "b"],
+            "sessions": [2, 1, 5, 6, None, 3],
+        })
+
+        converted_file = pdh.date_col_conversion(df = df, date_col = "ds")
+
+        # The same date in different series isn't a duplicate
+        self.assertEqual(
+            pdh.find_date_issues(converted_file["ds"], series = converted_file["series"]), 
+            (False, 0))
+
+        sorted_file = pdh.sort_by_date(converted_file, series_col = "series")
+        self.assertEqual(sorted_file["series"].tolist(), ["b", "b", "b", "a", "a", "a"])
+        self.assertEqual(sorted_file["sessions"].tolist()[:3], [1, 2, 3])
+        self.assertEqual(
+            pdh.find_date_issues(sorted_file["ds"], series = sorted_file["series"]), 
+            (True, 0))
+
+        series_bounds = pdh.check_for_data_blocks_by_series(
+            df = sorted_file,
+            target_column = "sessions",
+            date_column = "raw_date",
+            regressor_column_list = [],
+            series_column = "series")
+
+        self.assertEqual(series_bounds.loc["b"].tolist(), [0, 3, 3])
+        self.assertEqual(series_bounds.loc["a"].tolist(), [3, 5, 6])
+
+        # Each series should be a view of the whole data
+        current, future, current_plus_future = pdh.series_split(
+            df = sorted_file, 
+            series_bounds = series_bounds, 
+            series_id = "a")
+
+        self.assertEqual(current["sessions"].tolist(), [5, 6])
+        self.assertEqual(len(future), 1)
+        self.assertTrue(np.shares_memory(
+            current_plus_future["sessions"].to_numpy(), 
+            sorted_file["sessions"].to_numpy()))
+
+        # Rows without a series shouldn't be forecast as a series of their own
+        no_series = sorted_file.copy()
+        no_series.loc[4, "series"] = np.nan
+        with self.assertRaisesRegex(ValueError, "row 4"):
+            pdh.find_series_bounds(no_series, series_column = "series")
+
+        no_series_file = io.StringIO("ds,series,y\n2023-01-01,a,1\n2023-01-02,a,2\n2023-01-01,,3\n")
+        with self.assertRaisesRegex(ValueError, "row 2"):
+            pdh.read_csv_in_chunks(
+                file = no_series_file,
+                date_col = "ds",
+                numeric_cols = ["y"],
+                chunksize = 2,
+                series_col = "series")
+
+        # A gap in one series should say which series it's in
+        sorted_file.loc[1, "sessions"] = np.nan
+        with self.assertRaisesRegex(ValueError, "series 'b'"):
+            pdh.check_for_data_blocks_by_series(
+                df = sorted_file,
+                target_column = "sessions",
+                date_column = "raw_date",
+                regressor_column_list = [],
+                series_column = "series")
+
+    def test_compact_dtypes(self) -> None:
+
+        converted_file = pdh.date_col_conversion(
+            df = self.file_full.copy(), 
+            date_col = self.date_col)
+
+        compact_file, bytes_saved = pdh.compact_dtypes(converted_file)
+
+        self.assertEqual(compact_file["y"].dtype, "float32")
+        self.assertEqual(bytes_saved, len(converted_file) * 4)
+
+        # Nothing left to compact
+        _, bytes_saved = pdh.compact_dtypes(compact_file)
+        self.assertEqual(bytes_saved, 0)
+
+        # Long format data stores each series name once
+        long_file = pd.DataFrame({
+            "series": np.repeat(["first series", "second series"], 100),
+            "y": np.arange(200, dtype=float),
+        })
+        compact_long, bytes_saved = pdh.compact_dtypes(long_file, series_col = "series")
+
+        self.assertEqual(compact_long["series"].dtype, "category")
+        self.assertGreater(bytes_saved, long_file["y"].nbytes // 2)
+
+        series_bounds = pdh.find_series_bounds(compact_long, series_column = "series")
+        self.assertEqual(series_bounds.loc["second series"].tolist(), [100, 200])
+
     def test_rejecting_reorder(self) -> None:
 
         converted_disordered_file: pd.DataFrame = pdh.date_col_conversion(